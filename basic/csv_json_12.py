@@ -582,13 +582,18 @@ def datetime_decoder(dct):
                 pass
     return dct
 
-# Note: json.load() doesn't support custom decoders directly
-# You would need to process after loading
+# Without a decoder the date stays a string
 with open("event.json", "r") as jsonfile:
     data = json.load(jsonfile)
     print(f"Event: {data['event']}")
     print(f"Date (as string): {data['date']}")
 
+# json.load() calls object_hook for every decoded dictionary,
+# so the decoder runs while parsing (no second pass needed)
+with open("event.json", "r") as jsonfile:
+    data = json.load(jsonfile, object_hook=datetime_decoder)
+    print(f"Date (as datetime): {data['date']!r}")
+
 print("\n===== 23. JSON Error Handling =====")
 # Handling errors when working with JSON
 
@@ -972,6 +977,3569 @@ with open("settings.json", "w") as jsonfile:
 
 print("Real-world examples: grades.csv and settings.json created")
 
+print("\n===== 36. Columnar Typed CSV Loader =====")
+# csv_to_dict_list() keeps one dict of strings per row, which costs a lot of
+# memory for big files. A columnar loader keeps one compact column per header:
+# - integer columns -> array('q') (8 bytes per value)
+# - float columns   -> array('d') (8 bytes per value)
+# - text columns with few distinct values (like Department) -> dictionary
+#   encoded: a small list of labels plus an array of integer codes
+# - other text columns -> list of interned strings
+
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+
+# Generate a bigger employee file to compare the two approaches
+def generate_employee_csv(filename, num_rows, seed=42):
+    """Write a CSV file with num_rows random employees"""
+    rng = random.Random(seed)
+    departments = ["IT", "HR", "Finance", "Marketing", "Sales"]
+    cities = ["Mumbai", "Delhi", "Bangalore", "Pune", "Chennai"]
+    statuses = ["Active", "Inactive"]
+    with open(filename, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["EmployeeID", "Name", "Department", "City",
+                         "Age", "Salary", "Rating", "Status"])
+        for emp_id in range(1, num_rows + 1):
+            writer.writerow([
+                emp_id,
+                f"Employee{emp_id}",
+                rng.choice(departments),
+                rng.choice(cities),
+                rng.randint(21, 60),
+                rng.randrange(30000, 150000, 500),
+                round(rng.uniform(1, 5), 2),
+                rng.choice(statuses),
+            ])
+
+class CategoricalColumn:
+    """Dictionary-encoded text column: each value is stored as a small code"""
+    def __init__(self, labels, codes):
+        self.labels = labels    # code -> label
+        self.codes = codes      # array('H') of codes, one per row
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return self.labels[self.codes[index]]
+
+    def __iter__(self):
+        labels = self.labels
+        return (labels[code] for code in self.codes)
+
+class ColumnarTable:
+    """Table stored column by column, with dict row views for older code"""
+    def __init__(self, fieldnames, columns, num_rows):
+        self.fieldnames = fieldnames
+        self.columns = columns
+        self.num_rows = num_rows
+
+    def __len__(self):
+        return self.num_rows
+
+    def column(self, name):
+        """Return the typed column for a header"""
+        return self.columns[name]
+
+    def row(self, index):
+        """Return one row as a dictionary (like csv.DictReader gives)"""
+        return {name: self.columns[name][index] for name in self.fieldnames}
+
+    def rows(self):
+        """Iterate over all rows as dictionaries"""
+        columns = [self.columns[name] for name in self.fieldnames]
+        for values in zip(*columns):
+            yield dict(zip(self.fieldnames, values))
+
+    def memory_usage(self):
+        """Approximate number of bytes used by the column data"""
+        total = 0
+        for column in self.columns.values():
+            if isinstance(column, CategoricalColumn):
+                total += sys.getsizeof(column.codes)
+                total += sum(sys.getsizeof(label) for label in column.labels)
+            elif isinstance(column, array):
+                total += sys.getsizeof(column)
+            else:
+                # Interned strings are shared, so count each distinct one once
+                total += sys.getsizeof(column)
+                total += sum(sys.getsizeof(s) for s in {id(s): s for s in column}.values())
+        return total
+
+    def close(self):
+        """Nothing to release for an in-memory table (see MappedColumnarTable)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def _to_numeric_array(kind, values):
+    """Convert a batch of strings to array('q') or array('d')"""
+    if kind == "int":
+        return array("q", map(int, values))
+    try:
+        return array("d", map(float, values))
+    except ValueError:
+        # Empty fields in a float column become NaN
+        return array("d", [float(v) if v else float("nan") for v in values])
+
+def _detect_kind(values):
+    """Guess the column kind (int, float or text) from a batch of values"""
+    try:
+        _to_numeric_array("int", values)
+        return "int"
+    except OverflowError:
+        return "text"   # Too big for 64 bits, and float would round the digits
+    except ValueError:
+        pass
+    try:
+        _to_numeric_array("float", values)
+        return "float"
+    except ValueError:
+        return "text"
+
+def load_columnar(filename, batch_size=65536, max_categories=1000, text_columns=()):
+    """Load a CSV file into a ColumnarTable with one typed column per header
+
+    A numeric column that turns out to hold text later in the file is loaded
+    again as text (listed in text_columns), so every value keeps its original
+    string instead of a converted number.
+    """
+    with open(filename, "r", newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        fieldnames = next(reader, [])
+        width = len(fieldnames)
+        kinds = None
+        columns = {}
+        categories = {}     # header -> {label: code} while dictionary encoding
+        num_rows = 0
+
+        while True:
+            batch = [row for _, row in zip(range(batch_size), reader)]
+            if not batch:
+                break
+            num_rows += len(batch)
+            # Transpose rows into columns; pad short rows with empty strings
+            transposed = zip(*(row if len(row) == width else (row + [""] * width)[:width]
+                               for row in batch))
+            if kinds is None:
+                # The first batch decides the starting type of every column
+                transposed = list(transposed)
+                kinds = ["text" if name in text_columns else _detect_kind(values)
+                         for name, values in zip(fieldnames, transposed)]
+                for name, kind in zip(fieldnames, kinds):
+                    if kind == "text":
+                        categories[name] = {}
+                        columns[name] = CategoricalColumn([], array("H"))
+                    else:
+                        columns[name] = array("q" if kind == "int" else "d")
+
+            for index, (name, values) in enumerate(zip(fieldnames, transposed)):
+                kind = kinds[index]
+                column = columns[name]
+                if kind == "int":
+                    try:
+                        column.extend(_to_numeric_array("int", values))
+                        continue
+                    except ValueError:
+                        if column and max(map(abs, column)) > 2 ** 53:
+                            # float cannot hold these integers exactly
+                            return load_columnar(filename, batch_size, max_categories,
+                                                 (*text_columns, name))
+                        # Promote the column to float for the rest of the file
+                        column = columns[name] = array("d", column)
+                        kind = kinds[index] = "float"
+                    except OverflowError:
+                        return load_columnar(filename, batch_size, max_categories,
+                                             (*text_columns, name))
+                if kind == "float":
+                    try:
+                        column.extend(_to_numeric_array("float", values))
+                        continue
+                    except ValueError:
+                        # Not numeric after all: start again with this column as text
+                        return load_columnar(filename, batch_size, max_categories,
+                                             (*text_columns, name))
+                if isinstance(column, CategoricalColumn):
+                    codes = categories[name]
+                    labels = column.labels
+                    for value in values:
+                        code = codes.get(value)
+                        if code is None:
+                            if len(labels) >= max_categories:
+                                break
+                            code = codes[value] = len(labels)
+                            labels.append(value)
+                        column.codes.append(code)
+                    else:
+                        continue
+                    # Too many distinct values: switch to interned strings
+                    column = columns[name] = list(column)
+                    del categories[name]
+                    values = values[len(column) - (num_rows - len(batch)):]
+                column.extend(map(sys.intern, values))
+
+    if kinds is None:
+        columns = {name: [] for name in fieldnames}
+    return ColumnarTable(fieldnames, columns, num_rows)
+
+# Small example with the employees file
+table = load_columnar("employees_dict.csv")
+print(f"Loaded {len(table)} rows with columns: {table.fieldnames}")
+print(f"Salary column: {table.column('Salary')}")
+print(f"Department labels: {table.column('Department').labels}")
+print(f"Row 0 as dict: {table.row(0)}")
+# Output:
+# Loaded 4 rows with columns: ['Name', 'Department', 'Salary']
+# Salary column: array('q', [50000, 45000, 55000, 48000])
+# Department labels: ['IT', 'HR', 'Finance', 'Marketing']
+# Row 0 as dict: {'Name': 'Rahul', 'Department': 'IT', 'Salary': 50000}
+
+# Benchmark: memory per row and load time vs csv_to_dict_list()
+# The benchmarks in the following sections use a small file so the tutorial
+# runs in a moment; run "python csv_json_12.py --bench" for realistic sizes.
+BENCHMARK = "--bench" in sys.argv
+BENCHMARK_ROWS = 50000 if BENCHMARK else 2000
+generate_employee_csv("employees_large.csv", BENCHMARK_ROWS)
+
+def measure_load(load_func, filename):
+    """Return (result, seconds, bytes allocated) for a loader"""
+    start = time.perf_counter()
+    load_func(filename)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = load_func(filename)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, allocated
+
+dict_rows, dict_time, dict_bytes = measure_load(csv_to_dict_list, "employees_large.csv")
+col_table, col_time, col_bytes = measure_load(load_columnar, "employees_large.csv")
+print(f"csv_to_dict_list: {dict_time:.3f}s, {dict_bytes / len(dict_rows):.0f} bytes/row")
+print(f"load_columnar:    {col_time:.3f}s, {col_bytes / len(col_table):.0f} bytes/row")
+print(f"Same data: {col_table.row(123)['Salary'] == int(dict_rows[123]['Salary'])}")
+del dict_rows
+
+print("\n===== 37. Parallel CSV Processing with Multiple Processes =====")
+# process_large_csv() parses the whole file in one process, so only one CPU
+# core does the work. To use every core we can:
+# 1. Split the file into byte ranges that start and end on record boundaries
+# 2. Parse each range in a separate worker process
+# 3. Hand the parsed chunks back to a callback (in order or as they finish)
+#
+# A newline inside a quoted field is not a record boundary. Doubled quotes
+# ("") keep the count even, so a newline is a real boundary only when the
+# number of quote characters before it is even.
+#
+# On Windows and macOS every worker process starts by importing the main
+# script again, and this file runs all of its examples when it is loaded.
+# So the code that runs in worker processes lives in csv_json_parallel.py,
+# which has no side effects on import. Run that file to see the
+# multi-process benchmark; here workers=1 parses the ranges in this process.
+
+from csv_json_parallel import find_record_boundaries, parallel_process_csv, salary_totals
+
+# Quoted newlines stay inside their record
+with open("multiline_records.csv", "w", newline="") as csvfile:
+    writer = csv.writer(csvfile)
+    writer.writerow(["Name", "Note"])
+    for i in range(6):
+        writer.writerow([f"Item{i}", f"line one\nline two of item {i}"])
+
+header_end, ranges = find_record_boundaries("multiline_records.csv", 3)
+print(f"Header ends at byte {header_end}, ranges: {ranges}")
+received = []
+parallel_process_csv("multiline_records.csv", received.extend, workers=1, chunk_size=2)
+print(f"Records with quoted newlines: {[row['Name'] for row in received]}")
+# Output: Records with quoted newlines: ['Item0', 'Item1', 'Item2', 'Item3', 'Item4', 'Item5']
+
+# Same totals as the single-process generator from section 33
+totals = []
+parallel_process_csv("employees_large.csv", totals.append, process_func=salary_totals, workers=1)
+sequential = [salary_totals(chunk) for chunk in process_large_csv("employees_large.csv")]
+print(f"Same salary total: {sum(t for _, t in totals) == sum(t for _, t in sequential)}")
+
+print("\n===== 38. Row-Offset Index for Random Access =====")
+# Reading row 9,000,000 of a CSV normally means parsing every row before it.
+# An index that remembers the byte offset of every Nth record lets us seek
+# close to any row and parse only a few rows from there.
+# The index is saved in a sidecar JSON file together with the CSV's size and
+# modification time, so it is rebuilt automatically when the CSV changes.
+
+import io
+import mmap
+
+class CsvRowIndex:
+    """Sidecar index of record offsets for random access into a CSV file"""
+    def __init__(self, filename, every, fieldnames, num_rows, offsets, encoding="utf-8"):
+        self.filename = filename
+        self.every = every          # An offset is stored for every Nth row
+        self.fieldnames = fieldnames
+        self.num_rows = num_rows
+        self.offsets = offsets      # offsets[k] = byte offset of row k * every
+        self.encoding = encoding
+
+    @staticmethod
+    def sidecar_path(filename):
+        """Return the path of the index file for a CSV file"""
+        return filename + ".idx.json"
+
+    @classmethod
+    def build(cls, filename, every=1000, encoding="utf-8", quotechar='"'):
+        """Scan the CSV once, record offsets and save the sidecar file"""
+        quote = quotechar.encode()
+        offsets = []
+        num_rows = 0
+        with open(filename, "rb") as f:
+            header = b""
+            quotes = 0
+            for line in f:      # Binary line iteration is fast and exact
+                header += line
+                quotes += line.count(quote)
+                if quotes % 2 == 0:
+                    break
+            position = len(header)
+            record_start = position
+            quotes = 0
+            for line in f:
+                quotes += line.count(quote)
+                position += len(line)
+                if quotes % 2:
+                    continue    # Newline inside a quoted field
+                if line.strip():
+                    if num_rows % every == 0:
+                        offsets.append(record_start)
+                    num_rows += 1
+                record_start = position
+        fieldnames = next(csv.reader(io.StringIO(header.decode(encoding), newline="")), [])
+        index = cls(filename, every, fieldnames, num_rows, offsets, encoding)
+        index.save()
+        return index
+
+    def save(self):
+        """Write the index next to the CSV, stamped with its size and mtime"""
+        stat = os.stat(self.filename)
+        with open(self.sidecar_path(self.filename), "w") as jsonfile:
+            json.dump({
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "every": self.every,
+                "encoding": self.encoding,
+                "fieldnames": self.fieldnames,
+                "num_rows": self.num_rows,
+                "offsets": self.offsets,
+            }, jsonfile)
+
+    @classmethod
+    def open(cls, filename, every=1000, encoding="utf-8"):
+        """Load the sidecar index if it is still valid, otherwise rebuild it"""
+        try:
+            with open(cls.sidecar_path(filename), "r") as jsonfile:
+                saved = json.load(jsonfile)
+            stat = os.stat(filename)
+            if (saved["size"] == stat.st_size and saved["mtime_ns"] == stat.st_mtime_ns
+                    and saved["every"] == every and saved["encoding"] == encoding):
+                return cls(filename, every, saved["fieldnames"], saved["num_rows"],
+                           saved["offsets"], encoding)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+        return cls.build(filename, every, encoding)
+
+    def __len__(self):
+        return self.num_rows
+
+    def get_rows(self, start, count):
+        """Return rows start .. start+count-1 as dictionaries"""
+        if start < 0 or start >= self.num_rows or count <= 0:
+            return []
+        count = min(count, self.num_rows - start)
+        first_block = start // self.every
+        last_block = (start + count - 1) // self.every + 1
+        with open(self.filename, "rb") as f, \
+             mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            begin = self.offsets[first_block]
+            end = self.offsets[last_block] if last_block < len(self.offsets) else len(mm)
+            text = mm[begin:end].decode(self.encoding)
+        reader = csv.reader(io.StringIO(text, newline=""))
+        rows = (row for row in reader if row)
+        skip = start - first_block * self.every
+        for _ in range(skip):
+            next(rows)
+        return [dict(zip(self.fieldnames, row)) for _, row in zip(range(count), rows)]
+
+    def get_row(self, row_number):
+        """Return a single row (0-based) as a dictionary"""
+        rows = self.get_rows(row_number, 1)
+        if not rows:
+            raise IndexError(f"Row {row_number} out of range (0-{self.num_rows - 1})")
+        return rows[0]
+
+    def get_page(self, page, page_size=50):
+        """Return one page of rows (pages are numbered from 1)"""
+        return self.get_rows((page - 1) * page_size, page_size)
+
+# Build (or reuse) the index and jump straight to any row
+row_index = CsvRowIndex.open("employees_large.csv", every=500)
+print(f"Indexed rows: {len(row_index)}, stored offsets: {len(row_index.offsets)}")
+last_row = len(row_index) - 1
+print(f"Row {last_row}: {row_index.get_row(last_row)}")
+print(f"Page 3 (size 2): {[row['EmployeeID'] for row in row_index.get_page(3, 2)]}")
+# Output: Page 3 (size 2): ['5', '6']
+
+# Quoted newlines are handled: each record still counts as one row
+multiline_index = CsvRowIndex.open("multiline_records.csv", every=2)
+print(f"Row 3 of multiline file: {multiline_index.get_row(3)}")
+
+# Random access time vs scanning from the top
+start = time.perf_counter()
+for row_number in range(0, len(row_index), len(row_index) // 10):
+    row_index.get_row(row_number)
+indexed_time = (time.perf_counter() - start) / 10
+start = time.perf_counter()
+with open("employees_large.csv", "r") as csvfile:
+    for row_number, row in enumerate(csv.DictReader(csvfile)):
+        if row_number == last_row:
+            break
+scan_time = time.perf_counter() - start
+print(f"Indexed lookup: {indexed_time * 1000:.2f} ms, "
+      f"scan to row {last_row}: {scan_time * 1000:.2f} ms")
+
+print("\n===== 39. Group-By Aggregation Engine =====")
+# Section 11 counts departments and averages salaries with a Python loop over
+# DictReader rows, converting int(row["Salary"]) one row at a time.
+# A faster way is to work on whole column batches:
+# - read a few MB of text at a time and cut out only the needed columns
+#   (blocks without quotes are split with str.split() and list slicing,
+#   other blocks go through csv.reader)
+# - convert a whole column at once with map(int, ...) / map(float, ...)
+# - group row numbers in a dict, then gather each group's values and
+#   aggregate them with built-ins like sum(), min(), max() that run in C
+# Only the running totals per group are kept, so the file is streamed.
+
+import math
+from operator import mul
+
+def iter_column_batches(filename, columns, batch_bytes=1 << 22,
+                        encoding="utf-8", delimiter=","):
+    """Yield {column: list of string values} for blocks of whole records"""
+    with open(filename, "r", newline="", encoding=encoding) as csvfile:
+        header = next(csv.reader([csvfile.readline()], delimiter=delimiter), [])
+        width = len(header)
+        positions = {column: header.index(column) for column in columns}
+        pending = ""
+        while True:
+            chunk = csvfile.read(batch_bytes)
+            text = pending + chunk
+            if chunk:
+                cut = text.rfind("\n") + 1
+                # Wait for more text if the block ends inside a quoted field
+                if cut == 0 or text.count('"', 0, cut) % 2:
+                    pending = text
+                    continue
+                text, pending = text[:cut], text[cut:]
+            elif not text:
+                break
+            else:
+                pending = ""
+
+            if '"' not in text:
+                if "\r" in text:
+                    text = text.replace("\r\n", "\n")
+                if not text.endswith("\n"):
+                    text += "\n"
+                num_rows = text.count("\n")
+                # One C-level split for the whole block, then slice each column.
+                # Every row gets an extra "\n" field at its end: if all of them
+                # are where a row of width fields would end, no row is ragged
+                # (otherwise slicing would shift values into the wrong columns)
+                stride = width + 1
+                end = num_rows * stride
+                fields = text.replace("\n", delimiter + "\n" + delimiter).split(delimiter)
+                if (len(fields) == end + 1 and "\n\n" not in text and text[0] != "\n"
+                        and fields[width:end:stride].count("\n") == num_rows):
+                    yield {column: fields[position:end:stride]
+                           for column, position in positions.items()}
+                    continue
+            # Quoted fields, blank lines or ragged rows: use the csv module
+            rows = [row for row in csv.reader(io.StringIO(text, newline=""),
+                                              delimiter=delimiter) if row]
+            if not rows:
+                continue
+            yield {column: [row[position] if position < len(row) else "" for row in rows]
+                   for column, position in positions.items()}
+
+class GroupStats:
+    """Running count/sum/min/max/stddev for one column of one group"""
+    __slots__ = ("count", "total", "minimum", "maximum", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.m2 = 0.0       # Sum of squared differences from the mean
+
+    def add_batch(self, values):
+        """Merge a list of numbers into the running statistics"""
+        n = len(values)
+        if not n:
+            return
+        batch_total = sum(values)
+        batch_mean = batch_total / n
+        batch_m2 = max(math.fsum(map(mul, values, values)) - batch_total * batch_mean, 0.0)
+        batch_min, batch_max = min(values), max(values)
+        # Combine with the previous batches (parallel variance formula)
+        combined = self.count + n
+        delta = batch_mean - self.mean
+        self.m2 += batch_m2 + delta * delta * self.count * n / combined
+        self.mean += delta * n / combined
+        self.count = combined
+        self.total += batch_total
+        self.minimum = batch_min if self.minimum is None else min(self.minimum, batch_min)
+        self.maximum = batch_max if self.maximum is None else max(self.maximum, batch_max)
+
+    def result(self, func):
+        """Return the value of one aggregation function"""
+        if func == "count":
+            return self.count
+        if func == "sum":
+            return self.total
+        if func == "min":
+            return self.minimum
+        if func == "max":
+            return self.maximum
+        if func == "mean":
+            return self.total / self.count if self.count else None
+        if func == "stddev":
+            return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        raise ValueError(f"Unknown aggregation: {func}")
+
+AGGREGATIONS = ("count", "sum", "mean", "min", "max", "stddev")
+
+def _parse_number(value):
+    """Convert one cell to int or float; an empty cell becomes None"""
+    if not value.strip():
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+def _parse_numbers(values):
+    """Convert a column batch to ints, or to floats if that fails
+
+    Empty cells become None and are left out of the statistics.
+    """
+    try:
+        return list(map(int, values))
+    except ValueError:
+        pass
+    try:
+        return list(map(float, values))
+    except ValueError:
+        return list(map(_parse_number, values))
+
+def group_by_csv(filename, keys, aggregations, batch_bytes=1 << 22):
+    """Group a CSV by key column(s) and aggregate numeric columns
+
+    keys: a column name or a list of column names
+    aggregations: {"Salary": ["mean", "max"], ...}
+    Returns {group_key: {"count": n, "Salary_mean": ..., "Salary_max": ...}}
+    """
+    if isinstance(keys, str):
+        keys = [keys]
+    for funcs in aggregations.values():
+        for func in funcs:
+            if func not in AGGREGATIONS:
+                raise ValueError(f"Unknown aggregation: {func}")
+
+    counts = {}
+    stats = {column: {} for column in aggregations}
+    for batch in iter_column_batches(filename, list(dict.fromkeys(keys + list(aggregations))),
+                                     batch_bytes):
+        if len(keys) == 1:
+            group_keys = batch[keys[0]]
+        else:
+            group_keys = list(zip(*(batch[key] for key in keys)))
+        numbers = {column: _parse_numbers(batch[column]) for column in aggregations}
+        with_nulls = {column for column, values in numbers.items() if None in values}
+
+        # Hash grouping: one pass collects the row numbers of every group,
+        # then each group's values are gathered and aggregated in C
+        buckets = {}
+        for row_number, group in enumerate(group_keys):
+            bucket = buckets.get(group)
+            if bucket is None:
+                buckets[group] = [row_number]
+            else:
+                bucket.append(row_number)
+        for group, row_numbers in buckets.items():
+            counts[group] = counts.get(group, 0) + len(row_numbers)
+            for column, values in numbers.items():
+                group_stats = stats[column].get(group)
+                if group_stats is None:
+                    group_stats = stats[column][group] = GroupStats()
+                group_values = list(map(values.__getitem__, row_numbers))
+                if column in with_nulls:
+                    group_values = [value for value in group_values if value is not None]
+                group_stats.add_batch(group_values)
+
+    results = {}
+    for group, count in counts.items():
+        results[group] = {"count": count}
+        for column, funcs in aggregations.items():
+            for func in funcs:
+                results[group][f"{column}_{func}"] = stats[column][group].result(func)
+    return results
+
+# Department count and salary statistics (same as section 11, in one call)
+dept_stats = group_by_csv("employees_dict.csv", "Department", {"Salary": ["mean", "max"]})
+for dept, values in dept_stats.items():
+    print(f"  {dept}: {values}")
+# Output:
+#   IT: {'count': 1, 'Salary_mean': 50000.0, 'Salary_max': 50000}
+#   ...
+
+# Grouping by two keys with several aggregations
+city_stats = group_by_csv("employees_large.csv", ["Department", "Status"],
+                          {"Salary": ["mean", "stddev"], "Age": ["min", "max"]})
+print(f"('IT', 'Active'): {city_stats[('IT', 'Active')]}")
+
+# Benchmark against the per-row loop from section 11
+def group_by_row_loop(filename):
+    """Per-row DictReader loop: department count and average salary"""
+    counts = {}
+    totals = {}
+    with open(filename, "r") as csvfile:
+        for row in csv.DictReader(csvfile):
+            dept = row["Department"]
+            counts[dept] = counts.get(dept, 0) + 1
+            totals[dept] = totals.get(dept, 0) + int(row["Salary"])
+    return {dept: totals[dept] / counts[dept] for dept in counts}
+
+def best_time(func, *args, repeat=3):
+    """Return (result, fastest run time in seconds) of func(*args)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+loop_result, loop_time = best_time(group_by_row_loop, "employees_large.csv")
+engine_result, engine_time = best_time(group_by_csv, "employees_large.csv",
+                                       "Department", {"Salary": ["mean"]})
+same = all(abs(engine_result[d]["Salary_mean"] - loop_result[d]) < 1e-6 for d in loop_result)
+print(f"Row loop: {loop_time:.3f}s, group_by_csv: {engine_time:.3f}s "
+      f"({loop_time / engine_time:.1f}x faster, same result: {same})")
+
+print("\n===== 40. Declarative Filters with Column Pruning =====")
+# filter_csv() (pattern 5) builds a dict for every row and then calls a
+# Python function on it. A declarative filter describes the condition as data:
+#   ("Salary", ">", 50000)                          - one comparison
+#   ("and", ("Department", "==", "IT"), ("Status", "==", "Active"))
+#   ("or", cond1, cond2, ...)
+# Because the condition is data, it can be compiled once and we know exactly
+# which columns it needs. Only those columns (plus the requested output
+# columns) are split and converted, whole batches are tested at once, and
+# dicts are built only for the rows that pass.
+
+import operator
+from itertools import compress, repeat
+
+FILTER_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda value, options: value in options,
+    "not in": lambda value, options: value not in options,
+}
+
+def _parse_bools(values):
+    """Convert a column batch of true/false text to bools"""
+    return [value.strip().lower() in ("true", "1", "yes") for value in values]
+
+def _column_converter(literal):
+    """Pick the batch conversion for a column from the literal it is compared to
+
+    A numeric literal compares the column as numbers (ints, or floats if the
+    column has any), so ("Rating", ">", 3) works on "4.61" too.
+    """
+    if isinstance(literal, (set, frozenset, list, tuple)):
+        literal = next(iter(literal), "")
+    if isinstance(literal, bool):
+        return _parse_bools
+    if isinstance(literal, (int, float)):
+        return _parse_numbers   # Section 39: empty cells become None
+    return None     # Compare the raw strings
+
+def compile_filter(where):
+    """Compile a filter description into (needed columns, batch -> mask function)"""
+    if where[0] in ("and", "or"):
+        parts = [compile_filter(part) for part in where[1:]]
+        columns = set().union(*(part_columns for part_columns, _ in parts))
+        combine = operator.and_ if where[0] == "and" else operator.or_
+
+        def evaluate(batch, converted):
+            mask = None
+            for _, part in parts:
+                part_mask = part(batch, converted)
+                mask = part_mask if mask is None else list(map(combine, mask, part_mask))
+            return mask
+        return columns, evaluate
+
+    column, op, literal = where
+    if op not in FILTER_OPERATORS:
+        raise ValueError(f"Unknown operator: {op}")
+    compare = FILTER_OPERATORS[op]
+    convert = _column_converter(literal)
+    if op in ("in", "not in"):
+        literal = frozenset(literal)
+
+    def evaluate(batch, converted):
+        key = (column, convert)
+        values = converted.get(key)
+        if values is None:
+            # Each column is converted at most once per batch
+            values = batch[column] if convert is None else convert(batch[column])
+            converted[key] = values
+        if convert is _parse_numbers and None in values:
+            # An empty cell never matches a numeric comparison
+            return [value is not None and compare(value, literal) for value in values]
+        return list(map(compare, values, repeat(literal)))
+    return {column}, evaluate
+
+def filter_csv(filename, condition_func=None, where=None, columns=None):
+    """Filter CSV rows with a Python function, or with a compiled declarative filter
+
+    With where=..., only the columns used by the filter and the projected
+    columns are parsed; columns selects which fields the result dicts contain.
+    """
+    if where is None:
+        with open(filename, "r") as csvfile:
+            reader = csv.DictReader(csvfile)
+            rows = [row for row in reader if condition_func(row)]
+        if columns is not None:
+            rows = [{name: row[name] for name in columns} for row in rows]
+        return rows
+
+    if columns is None:
+        with open(filename, "r", newline="") as csvfile:
+            columns = next(csv.reader(csvfile), [])
+    needed, evaluate = compile_filter(where)
+    results = []
+    for batch in iter_column_batches(filename, list(dict.fromkeys([*columns, *needed]))):
+        mask = evaluate(batch, {})
+        if not any(mask):
+            continue
+        selected = [list(compress(batch[name], mask)) for name in columns]
+        results.extend(dict(zip(columns, values)) for values in zip(*selected))
+    return results
+
+# Active IT employees earning more than 140000, only Name and Salary returned
+active_it = ("and",
+             ("Department", "==", "IT"),
+             ("Status", "==", "Active"),
+             ("Salary", ">", 140000))
+matches = filter_csv("employees_large.csv", where=active_it, columns=["Name", "Salary"])
+print(f"Active IT employees with salary > 140000: {len(matches)}")
+print(f"First match: {matches[0]}")
+
+# Same question with the original callable-based filter
+start = time.perf_counter()
+old_matches = filter_csv(
+    "employees_large.csv",
+    lambda row: row["Department"] == "IT" and row["Status"] == "Active"
+    and int(row["Salary"]) > 140000,
+    columns=["Name", "Salary"])
+callable_time = time.perf_counter() - start
+start = time.perf_counter()
+filter_csv("employees_large.csv", where=active_it, columns=["Name", "Salary"])
+compiled_time = time.perf_counter() - start
+print(f"Callable filter: {callable_time:.3f}s, compiled filter: {compiled_time:.3f}s, "
+      f"same rows: {old_matches == matches}")
+
+# "in" and "or" conditions
+hr_or_senior = ("or", ("Department", "in", {"HR", "Finance"}), ("Age", ">=", 58))
+print(f"HR/Finance or age >= 58: {len(filter_csv('employees_large.csv', where=hr_or_senior))} rows")
+
+# An int literal still compares a float column as numbers
+top_rated = filter_csv("employees_large.csv", where=("Rating", ">", 4), columns=["Rating"])
+print(f"Rating > 4: {len(top_rated)} rows, lowest: {min(float(row['Rating']) for row in top_rated)}")
+
+print("\n===== 41. Streaming Batched CSV Writer =====")
+# dict_list_to_csv() needs the whole list in memory (it reads data[0].keys()
+# for the header). A writer object can accept records one at a time from any
+# generator instead:
+# - fieldnames are given up front or taken from the first batch of records
+# - rows are buffered and written in large batches (one big write call)
+# - append mode adds rows to an existing file without repeating the header
+
+class CsvBatchWriter:
+    """Write dict records to CSV in batches, from any iterable or generator"""
+    def __init__(self, filename, fieldnames=None, flush_rows=10000, mode="w",
+                 extrasaction="raise", encoding="utf-8"):
+        if mode not in ("w", "a"):
+            raise ValueError("mode must be 'w' or 'a'")
+        self.filename = filename
+        self.fieldnames = list(fieldnames) if fieldnames is not None else None
+        self.flush_rows = flush_rows
+        self.extrasaction = extrasaction
+        self.rows_written = 0
+        self._buffer = []
+        self._writer = None
+        self._text = io.StringIO()
+        # Appending to a non-empty file: reuse its header, don't write another
+        self._write_header = True
+        if mode == "a" and os.path.exists(filename) and os.path.getsize(filename) > 0:
+            self._write_header = False
+            if self.fieldnames is None:
+                with open(filename, "r", newline="", encoding=encoding) as csvfile:
+                    self.fieldnames = next(csv.reader(csvfile))
+        self._file = open(filename, mode, newline="", encoding=encoding)
+
+    def write(self, record):
+        """Add one record to the buffer"""
+        self._buffer.append(record)
+        if len(self._buffer) >= self.flush_rows:
+            self.flush()
+
+    def write_many(self, records):
+        """Add every record from an iterable (consumed lazily)"""
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        """Write the buffered rows to the file in one call"""
+        if not self._buffer:
+            return
+        if self._writer is None:
+            if self.fieldnames is None:
+                # Infer the header from the keys of the first batch (in order)
+                self.fieldnames = list(dict.fromkeys(key for record in self._buffer
+                                                     for key in record))
+            self._writer = csv.DictWriter(self._text, fieldnames=self.fieldnames,
+                                          extrasaction=self.extrasaction)
+            if self._write_header:
+                self._writer.writeheader()
+        self._writer.writerows(self._buffer)
+        self._file.write(self._text.getvalue())
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+        self._text.seek(0)
+        self._text.truncate()
+
+    def close(self):
+        """Flush remaining rows and close the file"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def stream_dict_list_to_csv(records, filename, fieldnames=None, flush_rows=10000, mode="w"):
+    """Write records from any iterable to CSV in constant memory; return row count"""
+    with CsvBatchWriter(filename, fieldnames, flush_rows, mode) as writer:
+        writer.write_many(records)
+    return writer.rows_written
+
+# Generator that produces records one at a time
+def generate_records(count):
+    """Yield simple employee-like records"""
+    for i in range(count):
+        yield {"Name": f"Emp{i}", "Department": "IT" if i % 2 else "HR", "Salary": 30000 + i}
+
+written = stream_dict_list_to_csv(generate_records(5), "streamed.csv", flush_rows=2)
+stream_dict_list_to_csv(generate_records(3), "streamed.csv", mode="a")
+with open("streamed.csv", "r") as csvfile:
+    lines = csvfile.read().splitlines()
+print(f"Rows written first: {written}, lines in file after append: {len(lines)}")
+print(f"Header written once: {lines[0]} / last line: {lines[-1]}")
+# Output:
+# Rows written first: 5, lines in file after append: 9
+# Header written once: Name,Department,Salary / last line: Emp2,HR,30002
+
+# Peak memory: full list + dict_list_to_csv vs generator + streaming writer
+export_rows = 2 * BENCHMARK_ROWS
+tracemalloc.start()
+dict_list_to_csv(list(generate_records(export_rows)), "list_export.csv")
+list_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+tracemalloc.start()
+stream_dict_list_to_csv(generate_records(export_rows), "stream_export.csv", flush_rows=1000)
+stream_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+print(f"Peak memory for {export_rows} rows - list: {list_peak / 1e6:.2f} MB, "
+      f"streaming: {stream_peak / 1e6:.2f} MB")
+os.remove("list_export.csv")
+os.remove("stream_export.csv")
+
+print("\n===== 42. Cached Schema Detection (Dialect + Column Types) =====")
+# Section 31 sniffs the dialect of a file each time it is read, and sections
+# 25 and 35 call int() by hand for known numeric columns. A schema detector
+# does this once per file:
+# - sample the file, sniff the dialect and whether it has a header
+# - infer a type per column: int, float, bool, date or string (+ nullable)
+# - cache the schema keyed by path + size + mtime (in memory and in a
+#   sidecar JSON file), so unchanged files are never sniffed again
+# - build a row converter function for the schema once
+
+from datetime import date
+
+_schema_cache = {}
+
+BOOL_VALUES = {"true": True, "false": False, "yes": True, "no": False}
+
+def _parse_bool(text):
+    """Convert 'true'/'false'/'yes'/'no' (any case) to a bool"""
+    return BOOL_VALUES[text.strip().lower()]
+
+TYPE_PARSERS = {
+    "int": int,
+    "float": float,
+    "bool": _parse_bool,
+    "date": date.fromisoformat,
+    "string": str,
+}
+
+# When a later value does not fit the sampled type, the column is widened
+WIDER_TYPES = {"int": "float", "float": "string", "bool": "string", "date": "string"}
+
+def _infer_type(values):
+    """Return (type name, nullable) for a list of sample strings"""
+    present = [value for value in values if value != ""]
+    nullable = len(present) < len(values)
+    for type_name in ("int", "float", "bool", "date"):
+        parser = TYPE_PARSERS[type_name]
+        try:
+            for value in present:
+                parser(value)
+        except (ValueError, KeyError):
+            continue
+        if present:
+            return type_name, nullable
+    return "string", nullable
+
+def _schema_key(filename):
+    """Cache key: absolute path plus the file's size and modification time"""
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+def detect_csv_schema(filename, sample_bytes=65536, encoding="utf-8"):
+    """Detect dialect, header and column types of a CSV file (cached)"""
+    key = _schema_key(filename)
+    schema = _schema_cache.get(key)
+    if schema is not None:
+        return schema
+    sidecar = filename + ".schema.json"
+    try:
+        with open(sidecar, "r") as jsonfile:
+            saved = json.load(jsonfile)
+        if [saved["size"], saved["mtime_ns"]] == list(key[1:]):
+            schema = _schema_cache[key] = saved["schema"]
+            return schema
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+
+    with open(filename, "r", newline="", encoding=encoding) as csvfile:
+        sample = csvfile.read(sample_bytes)
+    # Drop a possibly cut-off last line from the sample
+    if len(sample) == sample_bytes and "\n" in sample:
+        sample = sample[:sample.rfind("\n") + 1]
+    sniffer = csv.Sniffer()
+    try:
+        dialect = sniffer.sniff(sample)
+    except csv.Error:
+        dialect = csv.excel      # Could not decide: assume normal CSV
+    try:
+        has_header = sniffer.has_header(sample)
+    except csv.Error:
+        has_header = True
+    rows = [row for row in csv.reader(io.StringIO(sample, newline=""), dialect) if row]
+    width = max((len(row) for row in rows), default=0)
+    if has_header and rows:
+        fieldnames, rows = rows[0], rows[1:]
+    else:
+        fieldnames = [f"column_{i + 1}" for i in range(width)]
+    columns = []
+    for index, name in enumerate(fieldnames):
+        type_name, nullable = _infer_type([row[index] if index < len(row) else ""
+                                           for row in rows])
+        columns.append({"name": name, "type": type_name, "nullable": nullable})
+
+    schema = {
+        "dialect": {
+            "delimiter": dialect.delimiter,
+            "quotechar": dialect.quotechar,
+            "doublequote": dialect.doublequote,
+            "skipinitialspace": dialect.skipinitialspace,
+            "quoting": dialect.quoting,
+            "escapechar": dialect.escapechar,
+        },
+        "has_header": has_header,
+        "columns": columns,
+    }
+    _save_schema(filename, key, schema)
+    return schema
+
+def _save_schema(filename, key, schema):
+    """Store a schema in the memory cache and in the sidecar file"""
+    _schema_cache[key] = schema
+    with open(filename + ".schema.json", "w") as jsonfile:
+        json.dump({"size": key[1], "mtime_ns": key[2], "schema": schema}, jsonfile, indent=2)
+
+def _widen_schema(filename, schema, row):
+    """Return a copy of schema whose column types accept every value in row"""
+    columns = []
+    for column, value in zip(schema["columns"], row):
+        column = dict(column)
+        if value == "":
+            if column["type"] != "string":
+                column["nullable"] = True
+        else:
+            while column["type"] != "string":
+                try:
+                    TYPE_PARSERS[column["type"]](value)
+                    break
+                except (ValueError, KeyError):
+                    column["type"] = WIDER_TYPES[column["type"]]
+        columns.append(column)
+    schema = dict(schema, columns=columns)
+    # Replace the cached schema so later reads start with the wider types
+    _save_schema(filename, _schema_key(filename), schema)
+    return schema
+
+def compile_row_converter(schema):
+    """Build a function that turns a list of strings into a typed dict
+
+    The function body is generated once for the schema (like namedtuple
+    does), so each row is converted without looking up column types.
+    """
+    namespace = {}
+    fields = []
+    for index, column in enumerate(schema["columns"]):
+        value = f"row[{index}]"
+        if column["type"] != "string":
+            parser = f"parse_{index}"
+            namespace[parser] = TYPE_PARSERS[column["type"]]
+            if column["nullable"]:
+                value = f"({parser}({value}) if {value} else None)"
+            else:
+                value = f"{parser}({value})"
+        fields.append(f"{column['name']!r}: {value}")
+    source = "def convert_row(row):\n    return {" + ", ".join(fields) + "}\n"
+    exec(source, namespace)
+    return namespace["convert_row"]
+
+def widening_row_converter(filename, schema):
+    """Return a row converter that widens the schema when a value does not fit
+
+    The schema comes from a sample of the file. If a later value does not fit
+    (an empty cell in a column that looked non-nullable, a float in an int
+    column, ...), that column is widened from then on, and the cached schema
+    is updated. Rows converted before keep the types they were read with.
+    """
+    compiled = compile_row_converter(schema)
+
+    def convert_row(row):
+        nonlocal schema, compiled
+        try:
+            return compiled(row)
+        except (ValueError, KeyError):
+            schema = _widen_schema(filename, schema, row)
+            compiled = compile_row_converter(schema)
+            return compiled(row)
+    return convert_row
+
+def read_typed_csv(filename, encoding="utf-8"):
+    """Yield typed dict rows using the detected (cached) schema"""
+    schema = detect_csv_schema(filename, encoding=encoding)
+    convert_row = widening_row_converter(filename, schema)
+    width = len(schema["columns"])
+    with open(filename, "r", newline="", encoding=encoding) as csvfile:
+        reader = csv.reader(csvfile, **schema["dialect"])
+        if schema["has_header"]:
+            next(reader, None)
+        for row in reader:
+            if row:
+                if len(row) < width:
+                    row += [""] * (width - len(row))
+                yield convert_row(row)
+
+# Grade book with typed columns: no int() calls needed
+for row in read_typed_csv("grades.csv"):
+    avg = (row["Math"] + row["Science"] + row["English"]) / 3
+    print(f"{row['Student']}: Average = {avg:.2f}")
+
+# The pipe-separated file from section 31
+schema = detect_csv_schema("unknown_format.csv")
+print(f"Delimiter: '{schema['dialect']['delimiter']}', has header: {schema['has_header']}")
+print(f"Columns: {[(c['name'], c['type']) for c in schema['columns']]}")
+# Output: Columns: [('Name', 'string'), ('Age', 'int'), ('City', 'string')]
+
+# Types including dates, booleans and empty values
+with open("typed_sample.csv", "w", newline="") as csvfile:
+    writer = csv.writer(csvfile)
+    writer.writerow(["Name", "Joined", "Remote", "Bonus"])
+    writer.writerow(["Rahul", "2021-04-01", "yes", "1500.5"])
+    writer.writerow(["Priya", "2022-11-15", "no", ""])
+print(f"Typed rows: {list(read_typed_csv('typed_sample.csv'))}")
+
+# Values the sample did not show widen the column instead of failing
+with open("typed_sample.csv", "a", newline="") as csvfile:
+    csv.writer(csvfile).writerow(["Ankit", "", "maybe", "2000"])
+detect_csv_schema("typed_sample.csv", sample_bytes=80)    # Sample misses the new row
+print(f"Last row: {list(read_typed_csv('typed_sample.csv'))[-1]}")
+widened = detect_csv_schema("typed_sample.csv")["columns"]
+print(f"Widened: {[(c['name'], c['type'], c['nullable']) for c in widened]}")
+
+# Second lookup comes from the cache
+start = time.perf_counter()
+detect_csv_schema("employees_large.csv")
+first_time = time.perf_counter() - start
+start = time.perf_counter()
+detect_csv_schema("employees_large.csv")
+cached_time = time.perf_counter() - start
+print(f"Schema detection: {first_time * 1000:.2f} ms, cached: {cached_time * 1000:.3f} ms")
+
+print("\n===== 43. Streaming CSV to JSON Conversion =====")
+# Section 25 builds the full list of rows and then calls json.dump(), so a
+# big CSV needs the whole dataset plus its JSON text in memory.
+# A streaming converter encodes each row as soon as it is parsed and writes
+# a batch of encoded rows with one write() call. Output can be:
+# - "array": a normal JSON array, one record per line
+# - "jsonl": JSON Lines, one JSON document per line
+# Memory use depends on the batch size, not on the size of the input.
+
+def _encode_default(obj):
+    """Encode dates (from typed columns) as ISO strings"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def stream_csv_to_json(csv_filename, json_filename, output_format="array",
+                       types=None, batch_rows=5000, encoding="utf-8"):
+    """Convert CSV to a JSON array or JSON Lines without loading the file
+
+    types: None (keep strings), "auto" (use the detected schema, including
+    its dialect and header), or a dict of {column: type name or function},
+    e.g. {"Salary": "int"}.
+    Returns {"rows": ..., "seconds": ..., "rows_per_sec": ...}.
+    """
+    if output_format not in ("array", "jsonl"):
+        raise ValueError("output_format must be 'array' or 'jsonl'")
+    start = time.perf_counter()
+    encode = json.JSONEncoder(ensure_ascii=False, default=_encode_default).encode
+    rows = 0
+    with open(csv_filename, "r", newline="", encoding=encoding) as csvfile, \
+         open(json_filename, "w", encoding=encoding) as jsonfile:
+        if types == "auto":
+            schema = detect_csv_schema(csv_filename, encoding=encoding)
+            reader = csv.reader(csvfile, **schema["dialect"])
+            if schema["has_header"]:
+                next(reader, None)
+            width = len(schema["columns"])
+            # Widens a column when a value does not fit the sampled schema
+            convert_typed = widening_row_converter(csv_filename, schema)
+
+            def convert_row(row):
+                if len(row) < width:
+                    row += [""] * (width - len(row))
+                return convert_typed(row)
+        else:
+            reader = csv.reader(csvfile)
+            fieldnames = next(reader, [])
+            parsers = [TYPE_PARSERS.get(kind, kind)
+                       for kind in ((types or {}).get(name, "string") for name in fieldnames)]
+
+            def convert_row(row):
+                # Empty fields in typed columns become null
+                return {name: value if parse is str else (parse(value) if value else None)
+                        for name, parse, value in zip(fieldnames, parsers, row)}
+
+        separator = ",\n" if output_format == "array" else "\n"
+        if output_format == "array":
+            jsonfile.write("[\n")
+        batch = []
+        for row in reader:
+            if not row:
+                continue
+            batch.append(encode(convert_row(row)))
+            if len(batch) >= batch_rows:
+                jsonfile.write((separator if rows else "") + separator.join(batch))
+                rows += len(batch)
+                batch = []
+        if batch:
+            jsonfile.write((separator if rows else "") + separator.join(batch))
+            rows += len(batch)
+        jsonfile.write("\n]\n" if output_format == "array" else ("\n" if rows else ""))
+
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds,
+            "rows_per_sec": rows / seconds if seconds else float("inf")}
+
+# Same result as section 25 (Salary as a number), written incrementally
+stats = stream_csv_to_json("employees_dict.csv", "employees_stream.json", types={"Salary": "int"})
+with open("employees_stream.json", "r") as jsonfile:
+    print(f"Streamed {stats['rows']} rows, same as section 25: {json.load(jsonfile) == csv_to_json_data}")
+
+# Automatic typing also uses the detected dialect (here "|") and header
+stream_csv_to_json("unknown_format.csv", "unknown_format.json", types="auto")
+with open("unknown_format.json", "r") as jsonfile:
+    print(f"Pipe-separated file: {json.load(jsonfile)[0]}")
+# Output: Pipe-separated file: {'Name': 'Rahul', 'Age': 25, 'City': 'Mumbai'}
+os.remove("unknown_format.json")
+
+# JSON Lines output with automatic typing
+stats = stream_csv_to_json("employees_large.csv", "employees_large.jsonl",
+                           output_format="jsonl", types="auto")
+print(f"JSON Lines: {stats['rows']} rows at {stats['rows_per_sec']:,.0f} rows/sec")
+
+# Peak memory compared with the build-a-list approach of section 25
+tracemalloc.start()
+with open("employees_large.csv", "r") as csvfile:
+    all_rows = list(csv.DictReader(csvfile))
+with open("employees_large_list.json", "w") as jsonfile:
+    json.dump(all_rows, jsonfile, indent=2)
+list_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+del all_rows
+tracemalloc.start()
+stream_csv_to_json("employees_large.csv", "employees_large_stream.json")
+stream_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+print(f"Peak memory - full list: {list_peak / 1e6:.2f} MB, streaming: {stream_peak / 1e6:.2f} MB")
+os.remove("employees_large_list.json")
+os.remove("employees_large_stream.json")
+
+print("\n===== 44. Streaming JSON to CSV with Schema Discovery =====")
+# Section 26 loads the whole JSON file and uses json_data[0].keys() as the
+# CSV header, so keys that only appear in later records are lost.
+# A streaming converter reads records one at a time and supports three ways
+# to choose the header:
+# - "scan":   use the keys of the first N records (one pass)
+# - "union":  read the file twice, first to collect every key
+# - "schema": use an explicit list of fieldnames
+# Nested objects can be flattened into dotted columns ("address.city").
+
+def iter_json_records(filename, chunk_size=1 << 16, encoding="utf-8"):
+    """Yield items of a top-level JSON array, or documents of a JSON Lines file
+
+    The file is read in chunks and each item is decoded with raw_decode(),
+    so only one item (plus one chunk) is in memory at a time. Items of an
+    array must be separated by commas, JSON Lines documents by newlines;
+    anything else raises json.JSONDecodeError.
+    """
+    decoder = json.JSONDecoder()
+    with open(filename, "r", encoding=encoding) as jsonfile:
+        buffer = jsonfile.read(chunk_size)
+        pos = 0
+        eof = not buffer
+        # start:      nothing read yet ("[" or a first document may follow)
+        # first_item: after "[" (an item or "]")
+        # item:       after "," (an item)
+        # separator:  after an array item ("," or "]")
+        # document:   after a JSON Lines document (a newline, then a document)
+        # end:        after the closing "]" (only whitespace)
+        state = "start"
+        newline_seen = False
+        while True:
+            # Skip whitespace, remembering whether it contained a newline
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                    newline_seen = newline_seen or buffer[pos] == "\n"
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                buffer, pos = jsonfile.read(chunk_size), 0
+                eof = not buffer
+            if pos >= len(buffer):
+                if state in ("first_item", "item", "separator"):
+                    raise json.JSONDecodeError("Unexpected end of file: missing ']'", buffer, pos)
+                return
+            char = buffer[pos]
+            if state == "start" and char == "[":
+                state = "first_item"
+                pos += 1
+                continue
+            if state in ("first_item", "separator") and char == "]":
+                state = "end"
+                pos += 1
+                continue
+            if state == "separator":
+                if char != ",":
+                    raise json.JSONDecodeError("Expecting ',' or ']'", buffer, pos)
+                state = "item"
+                pos += 1
+                continue
+            if state == "end":
+                raise json.JSONDecodeError("Extra data after the array", buffer, pos)
+            if state == "document" and not newline_seen:
+                raise json.JSONDecodeError("Expecting a newline between documents", buffer, pos)
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # A number at the end of the buffer may continue in the next chunk
+                complete = eof or not (isinstance(item, (int, float))
+                                       and not buffer[end:].lstrip("0123456789.eE+-"))
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if complete:
+                pos = end
+                state = "document" if state in ("start", "document") else "separator"
+                newline_seen = False
+                yield item
+                continue
+            # Item continues past the buffer: read more (doubling for big items)
+            more = jsonfile.read(max(chunk_size, len(buffer) - pos))
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+
+def flatten_record(record, prefix="", separator="."):
+    """Flatten nested dicts into dotted keys; lists are stored as JSON text"""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, name + separator, separator))
+        elif isinstance(value, list):
+            flat[name] = json.dumps(value)
+        else:
+            flat[name] = value
+    return flat
+
+def stream_json_to_csv(json_filename, csv_filename, header="scan", fieldnames=None,
+                       scan_records=1000, flatten=True):
+    """Convert a JSON array / JSON Lines file to CSV, record by record
+
+    Returns {"rows": ..., "fieldnames": [...], "dropped_keys": [...]} where
+    dropped_keys lists keys that appeared after the header was fixed.
+    """
+    prepare = flatten_record if flatten else dict
+    records = map(prepare, iter_json_records(json_filename))
+
+    if header == "schema":
+        if fieldnames is None:
+            raise ValueError("header='schema' needs fieldnames")
+        fieldnames = list(fieldnames)
+        first_records = []
+    elif header == "union":
+        # First pass: collect every key in order of first appearance
+        keys = {}
+        for record in records:
+            keys.update(dict.fromkeys(record))
+        fieldnames = list(keys)
+        records = map(prepare, iter_json_records(json_filename))
+        first_records = []
+    elif header == "scan":
+        first_records = [record for _, record in zip(range(scan_records), records)]
+        fieldnames = list(dict.fromkeys(key for record in first_records for key in record))
+    else:
+        raise ValueError("header must be 'scan', 'union' or 'schema'")
+
+    known = set(fieldnames)
+    dropped = {}
+
+    def check_keys(stream):
+        # Remember keys that do not fit the header instead of failing silently
+        for record in stream:
+            if not known.issuperset(record):
+                dropped.update(dict.fromkeys(key for key in record if key not in known))
+            yield record
+
+    with CsvBatchWriter(csv_filename, fieldnames, extrasaction="ignore") as writer:
+        writer.write_many(check_keys(first_records))
+        writer.write_many(check_keys(records))
+    return {"rows": writer.rows_written, "fieldnames": fieldnames,
+            "dropped_keys": list(dropped)}
+
+# Same conversion as section 26, without loading the whole file
+result = stream_json_to_csv("employees.json", "employees_streamed_from_json.csv")
+print(f"Converted {result['rows']} rows with header {result['fieldnames']}")
+
+# Records with different and nested keys (JSON Lines)
+with open("mixed_records.jsonl", "w") as jsonfile:
+    jsonfile.write(json.dumps({"id": 1, "name": "Rahul", "address": {"city": "Mumbai"}}) + "\n")
+    jsonfile.write(json.dumps({"id": 2, "name": "Priya", "skills": ["SQL", "Python"]}) + "\n")
+    jsonfile.write(json.dumps({"id": 3, "name": "Ankit", "address": {"city": "Pune", "pin": 411001}}) + "\n")
+
+scan = stream_json_to_csv("mixed_records.jsonl", "mixed_scan.csv", scan_records=1)
+print(f"Scan first record only - header: {scan['fieldnames']}, dropped: {scan['dropped_keys']}")
+union = stream_json_to_csv("mixed_records.jsonl", "mixed_union.csv", header="union")
+print(f"Union of all records - header: {union['fieldnames']}")
+# Output: Union of all records - header: ['id', 'name', 'address.city', 'skills', 'address.pin']
+with open("mixed_union.csv", "r") as csvfile:
+    print(csvfile.read())
+
+# Records are decoded one by one even from a single-line JSON array
+stream_csv_to_json("employees_large.csv", "employees_compact.json", types="auto")
+start = time.perf_counter()
+result = stream_json_to_csv("employees_compact.json", "employees_roundtrip.csv")
+print(f"Streamed {result['rows']} records back to CSV in {time.perf_counter() - start:.3f}s")
+os.remove("employees_roundtrip.csv")    # employees_compact.json is used again in section 46
+
+print("\n===== 45. Binary Columnar Cache for CSV Files =====")
+# Files that are loaded many times a day are parsed again on every load.
+# Instead we can "compile" the CSV once into a binary columnar file:
+# - int / float columns are stored as raw 8-byte values (array('q') / array('d'))
+# - text columns are stored as an offsets array plus one UTF-8 blob
+# - dictionary-encoded columns store their small codes plus the label list
+# Opening the cache memory-maps the file: numeric columns become memoryviews
+# over the mapping and strings are decoded only when accessed, so opening
+# needs no parsing at all.
+#
+# File layout: b"CSVCOL1\0" | 8-byte metadata length | metadata JSON |
+#              column data blocks (each aligned to 8 bytes)
+
+import struct
+from itertools import accumulate
+
+COLUMNAR_MAGIC = b"CSVCOL1\0"
+
+class MappedStringColumn:
+    """Text column stored as offsets + UTF-8 blob inside a memory map"""
+    def __init__(self, mm, offsets, blob_start):
+        self.mm = mm
+        self.offsets = offsets      # memoryview of int64, one more than rows
+        self.blob_start = blob_start
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        start = self.blob_start + self.offsets[index]
+        return self.mm[start:self.blob_start + self.offsets[index + 1]].decode("utf-8")
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+class MappedColumnarTable(ColumnarTable):
+    """ColumnarTable whose columns live in a memory-mapped cache file"""
+    def __init__(self, fieldnames, columns, num_rows, mm, views):
+        super().__init__(fieldnames, columns, num_rows)
+        self._mm = mm
+        self._views = views
+
+    def close(self):
+        """Release the memory views and unmap the file"""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self.columns = {}
+        self._mm.close()
+
+def columnar_cache_path(filename):
+    """Return the path of the binary cache for a CSV file"""
+    return filename + ".colcache"
+
+def compile_columnar_cache(filename, cache_filename=None):
+    """Parse a CSV once and write it as a binary columnar cache file"""
+    cache_filename = cache_filename or columnar_cache_path(filename)
+    stat = os.stat(filename)
+    table = load_columnar(filename)
+    blocks = []
+    columns_meta = []
+    position = 0
+
+    def add_block(data):
+        # Return the block's offset in the data section, padded to 8 bytes
+        nonlocal position
+        offset = position
+        padding = -len(data) % 8
+        blocks.append(data + b"\0" * padding)
+        position += len(data) + padding
+        return offset
+
+    for name in table.fieldnames:
+        column = table.column(name)
+        if isinstance(column, array):
+            kind = "int" if column.typecode == "q" else "float"
+            columns_meta.append({"name": name, "kind": kind,
+                                 "data": add_block(column.tobytes())})
+        elif isinstance(column, CategoricalColumn):
+            columns_meta.append({"name": name, "kind": "category", "labels": column.labels,
+                                 "data": add_block(column.codes.tobytes())})
+        else:
+            encoded = [value.encode("utf-8") for value in column]
+            offsets = array("q", [0])
+            offsets.extend(accumulate(map(len, encoded)))
+            columns_meta.append({"name": name, "kind": "string",
+                                 "offsets": add_block(offsets.tobytes()),
+                                 "data": add_block(b"".join(encoded))})
+
+    metadata = json.dumps({
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "num_rows": len(table),
+        "columns": columns_meta,
+    }).encode("utf-8")
+    metadata += b" " * (-(len(metadata) + 16) % 8)    # Keep the data 8-byte aligned
+    temp_filename = cache_filename + ".tmp"
+    with open(temp_filename, "wb") as cachefile:
+        cachefile.write(COLUMNAR_MAGIC + struct.pack("<Q", len(metadata)) + metadata)
+        for block in blocks:
+            cachefile.write(block)
+    os.replace(temp_filename, cache_filename)
+    return cache_filename
+
+def open_columnar_cache(cache_filename):
+    """Memory-map a columnar cache file and return a MappedColumnarTable
+
+    Raises ValueError if the file is not a cache file or is truncated or
+    damaged (every block is checked against the file size before mapping).
+    """
+    with open(cache_filename, "rb") as cachefile:
+        mm = mmap.mmap(cachefile.fileno(), 0, access=mmap.ACCESS_READ)
+    whole = memoryview(mm)
+    views = [whole]
+    try:
+        if mm[:8] != COLUMNAR_MAGIC or len(mm) < 16:
+            raise ValueError(f"{cache_filename} is not a columnar cache file")
+        (metadata_length,) = struct.unpack("<Q", mm[8:16])
+        data_start = 16 + metadata_length
+        if data_start > len(mm):
+            raise ValueError(f"{cache_filename} is truncated")
+        metadata = json.loads(mm[16:data_start])
+        num_rows = metadata["num_rows"]
+        columns = {}
+
+        def view(offset, typecode, count):
+            start = data_start + offset
+            size = struct.calcsize(typecode) * count
+            if start < data_start or start + size > len(mm):
+                raise ValueError(f"{cache_filename} is truncated")
+            part = whole[start:start + size].cast(typecode)
+            views.append(part)
+            return part
+
+        for meta in metadata["columns"]:
+            kind = meta["kind"]
+            if kind in ("int", "float"):
+                columns[meta["name"]] = view(meta["data"], "q" if kind == "int" else "d", num_rows)
+            elif kind == "category":
+                columns[meta["name"]] = CategoricalColumn(meta["labels"],
+                                                          view(meta["data"], "H", num_rows))
+            else:
+                offsets = view(meta["offsets"], "q", num_rows + 1)
+                if data_start + meta["data"] + offsets[-1] > len(mm):
+                    raise ValueError(f"{cache_filename} is truncated")
+                columns[meta["name"]] = MappedStringColumn(mm, offsets, data_start + meta["data"])
+        fieldnames = [meta["name"] for meta in metadata["columns"]]
+        table = MappedColumnarTable(fieldnames, columns, num_rows, mm, views)
+        table.source_size = metadata["source_size"]
+        table.source_mtime_ns = metadata["source_mtime_ns"]
+        return table
+    except (ValueError, KeyError, TypeError) as e:
+        for part in reversed(views):
+            part.release()
+        mm.close()
+        if isinstance(e, ValueError):
+            raise
+        raise ValueError(f"{cache_filename} has damaged metadata: {e!r}") from None
+
+def load_csv_cached(filename, build_cache=True):
+    """Open the columnar cache if it is fresh; otherwise rebuild it or parse the CSV
+
+    Use the result in a with block (or call close()): both kinds of table
+    support it, so callers do not need to know whether a cache was used.
+    """
+    cache_filename = columnar_cache_path(filename)
+    stat = os.stat(filename)
+    try:
+        table = open_columnar_cache(cache_filename)
+        if (table.source_size, table.source_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return table
+        table.close()   # Stale: the CSV changed after the cache was built
+    except (FileNotFoundError, ValueError):
+        pass
+    if build_cache:
+        try:
+            return open_columnar_cache(compile_columnar_cache(filename))
+        except OSError:
+            pass        # e.g. read-only directory: fall back to parsing
+    return load_columnar(filename)
+
+# First call compiles the cache, later calls just map it
+with load_csv_cached("employees_dict.csv") as cached:
+    print(f"Cached columns: {cached.fieldnames}, rows: {len(cached)}")
+    print(f"Row 2: {cached.row(2)}")
+    print(f"Salaries: {list(cached.column('Salary'))}")
+# Output: Salaries: [50000, 45000, 55000, 48000]
+
+# Without a cache (and build_cache=False) the CSV is parsed; same interface
+with load_csv_cached("grades.csv", build_cache=False) as parsed:
+    print(f"Parsed table: {type(parsed).__name__}, rows: {len(parsed)}")
+# Output: Parsed table: ColumnarTable, rows: 3
+
+# A truncated cache file (e.g. after a crash) is ignored and rebuilt
+cache_file = columnar_cache_path("employees_dict.csv")
+with open(cache_file, "r+b") as cachefile:
+    cachefile.truncate(12)
+with load_csv_cached("employees_dict.csv") as cached:
+    print(f"After truncating the cache: {type(cached).__name__}, rows: {len(cached)}")
+# Output: After truncating the cache: MappedColumnarTable, rows: 4
+
+# Cold load time: parsing the CSV vs opening a fresh cache
+load_csv_cached("employees_large.csv").close()      # Build the cache once
+start = time.perf_counter()
+with open("employees_large.csv", "r") as csvfile:
+    parsed_rows = list(csv.DictReader(csvfile))
+parse_time = time.perf_counter() - start
+start = time.perf_counter()
+cached = load_csv_cached("employees_large.csv")
+cache_time = time.perf_counter() - start
+probe = len(parsed_rows) // 2
+same = cached.row(probe)["Name"] == parsed_rows[probe]["Name"]
+print(f"DictReader load: {parse_time * 1000:.1f} ms, cache open: {cache_time * 1000:.2f} ms, "
+      f"same data: {same}")
+print(f"Average salary from mapped column: {sum(cached.column('Salary')) / len(cached):.2f}")
+cached.close()
+del parsed_rows
+# Remove the cache files written by this example
+for name in ("employees_dict.csv", "employees_large.csv"):
+    os.remove(columnar_cache_path(name))
+
+print("\n===== 46. Incremental JSON Event Parser (No Extra Libraries) =====")
+# Section 33 suggests the ijson library for big JSON files. The same idea can
+# be built with the standard library:
+# - read the file in fixed-size chunks
+# - split the text into tokens with one compiled regular expression
+# - produce ijson-style events: (prefix, event, value), for example
+#     ("", "start_map", None), ("", "map_key", "data"),
+#     ("data.users.item.name", "string", "Rahul"), ...
+# - or build complete items found at a path like "data.users.item"
+# When building items, each item is decoded with json's C decoder
+# (raw_decode) straight from the buffer, so only the outer structure is
+# tokenized in Python. Memory use is one chunk plus the current item.
+
+import re
+from json.decoder import scanstring
+
+JSON_TOKEN = re.compile(r"""
+    [ \t\r\n]*
+    (?:
+        ([{}\[\]:,])                                # punctuation
+      | ("[^"\\\x00-\x1f]*(?:\\["\\/bfnrtu][^"\\\x00-\x1f]*)*") # string (no raw control chars)
+      | (-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?) # number
+      | (true|false|null)                           # literal
+    )""", re.VERBOSE)
+
+NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+# A string that is cut off by the end of the buffer (and may still be valid)
+PARTIAL_STRING = re.compile(r'"[^"\\\x00-\x1f]*(?:\\["\\/bfnrtu][^"\\\x00-\x1f]*)*\\?\Z')
+ITEM_SEPARATOR = re.compile(r"[ \t\r\n]*,[ \t\r\n]*")
+
+JSON_LITERALS = {"true": ("boolean", True), "false": ("boolean", False), "null": ("null", None)}
+
+# The parser tracks which tokens may come next; a token that does not fit
+# (like the second value in [1 2]) is an error
+JSON_EXPECTED = {
+    "value": "a value", "first_value": "a value or ']'",
+    "key": "a string key", "first_key": "a string key or '}'",
+    "colon": "':'", "comma": "',' or a closing bracket", "end": "the end of the JSON",
+}
+
+class IncrementalJsonParser:
+    """Parse a JSON text file chunk by chunk into events or items"""
+    def __init__(self, jsonfile, chunk_size=1 << 16):
+        self.file = jsonfile
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """Drop consumed text and append the next chunk"""
+        more = self.file.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        self.buffer = self.buffer[self.pos:] + more
+        self.pos = 0
+        self.eof = not more
+
+    def _next_token(self):
+        """Return the next complete token match, or None at the end of input"""
+        while True:
+            match = JSON_TOKEN.match(self.buffer, self.pos)
+            # A token touching the end of the buffer may continue in the next
+            # chunk (for numbers, "1." or "1e" at the end may continue too)
+            if match and (self.eof or (match.end() < len(self.buffer) and not (
+                    match.lastindex == 3 and NUMBER_TAIL.match(self.buffer, match.end())))):
+                self.pos = match.end()
+                return match
+            rest = self.buffer[self.pos:].lstrip()
+            if match is None and rest and (rest[0] not in '"-0123456789tfn' or (
+                    rest[0] == '"' and not PARTIAL_STRING.match(rest))):
+                raise ValueError(f"Invalid JSON near: {rest[:20]!r}")
+            if self.eof:
+                if rest:
+                    raise ValueError(f"Invalid or truncated JSON near: {rest[:20]!r}")
+                return None
+            self._fill()
+
+    def _decode_value(self, start):
+        """Decode one complete value starting at buffer[start] with raw_decode"""
+        self.pos = start
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                number_may_continue = (isinstance(value, (int, float))
+                                       and NUMBER_TAIL.match(self.buffer, end))
+                if self.eof or not number_may_continue:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def events(self, items_path=None):
+        """Yield (prefix, event, value) tuples
+
+        If items_path is given, values at that prefix are decoded whole and
+        yielded as (prefix, "item", value) instead of their inner events.
+        """
+        stack = []          # (is_map, prefix of the container)
+        current = ""        # prefix of the next value
+        expect = "value"    # which tokens may come next (see JSON_EXPECTED)
+        while True:
+            match = self._next_token()
+            if match is None:
+                if expect != "end":
+                    raise ValueError("Unexpected end of JSON: "
+                                     + ("unclosed container" if stack else "no value"))
+                return
+            punctuation, string, number, literal = match.groups()
+            if punctuation in ("}", "]"):
+                is_map = punctuation == "}"
+                if (not stack or stack[-1][0] != is_map
+                        or expect not in ("comma", "first_key" if is_map else "first_value")):
+                    raise ValueError(f"Unexpected '{punctuation}', expected {JSON_EXPECTED[expect]}")
+                _, current = stack.pop()
+                expect = "comma" if stack else "end"
+                yield current, "end_map" if is_map else "end_array", None
+            elif punctuation in (",", ":"):
+                if expect != ("comma" if punctuation == "," else "colon"):
+                    raise ValueError(f"Unexpected '{punctuation}', expected {JSON_EXPECTED[expect]}")
+                expect = "key" if punctuation == "," and stack[-1][0] else "value"
+            elif expect in ("key", "first_key"):
+                if not string:
+                    raise ValueError(f"Unexpected {match.group(match.lastindex)!r}, "
+                                     f"expected {JSON_EXPECTED[expect]}")
+                text = string[1:-1] if "\\" not in string else scanstring(string, 1)[0]
+                base = stack[-1][1]
+                yield base, "map_key", text
+                current = f"{base}.{text}" if base else text
+                expect = "colon"
+            elif expect not in ("value", "first_value"):
+                raise ValueError(f"Unexpected {match.group(match.lastindex)!r}, "
+                                 f"expected {JSON_EXPECTED[expect]}")
+            elif current == items_path:
+                yield current, "item", self._decode_value(match.start(match.lastindex))
+                # Inside an array, decode the following items without tokenizing
+                if stack and not stack[-1][0]:
+                    while True:
+                        separator = ITEM_SEPARATOR.match(self.buffer, self.pos)
+                        if separator is None or separator.end() >= len(self.buffer):
+                            break   # "]" or end of buffer: let the tokenizer handle it
+                        yield current, "item", self._decode_value(separator.end())
+                expect = "comma" if stack else "end"
+            elif punctuation == "{":
+                yield current, "start_map", None
+                stack.append((True, current))
+                expect = "first_key"
+            elif punctuation == "[":
+                yield current, "start_array", None
+                stack.append((False, current))
+                current = f"{current}.item" if current else "item"
+                expect = "first_value"
+            else:
+                expect = "comma" if stack else "end"
+                if string:
+                    text = string[1:-1] if "\\" not in string else scanstring(string, 1)[0]
+                    yield current, "string", text
+                elif number:
+                    is_float = "." in number or "e" in number or "E" in number
+                    yield current, "number", float(number) if is_float else int(number)
+                else:
+                    event, value = JSON_LITERALS[literal]
+                    yield current, event, value
+
+def iter_json_events(filename, chunk_size=1 << 16, encoding="utf-8"):
+    """Yield ijson-style (prefix, event, value) events from a JSON file"""
+    with open(filename, "r", encoding=encoding) as jsonfile:
+        yield from IncrementalJsonParser(jsonfile, chunk_size).events()
+
+def iter_json_items(filename, path, chunk_size=1 << 16, encoding="utf-8"):
+    """Yield complete values found at a path like "data.users.item" """
+    with open(filename, "r", encoding=encoding) as jsonfile:
+        for _, event, value in IncrementalJsonParser(jsonfile, chunk_size).events(path):
+            if event == "item":
+                yield value
+
+# Events for the API response from section 28
+for prefix, event, value in list(iter_json_events("api_response.json"))[:8]:
+    print(f"  {prefix!r:22} {event:12} {value!r}")
+# Output:
+#   ''                     start_map    None
+#   ''                     map_key      'status'
+#   'status'               string       'success'
+#   ''                     map_key      'data'
+#   'data'                 start_map    None
+#   'data'                 map_key      'users'
+#   'data.users'           start_array  None
+#   'data.users.item'      start_map    None
+
+# Build only the users, one at a time
+for user in iter_json_items("api_response.json", "data.users.item"):
+    print(f"  User: {user['name']} ({user['email']})")
+
+# Same items as json.load, even with a tiny chunk size
+same = list(iter_json_items("company.json", "employees.item", chunk_size=7)) == company_data["employees"]
+print(f"Items match json.load: {same}")
+
+# Tokens in the wrong place are errors, just like with json.load
+for text in ['{"a": 1 "b": 2}', "[1 2]", "[1,,2]", '["raw\nnewline"]']:
+    try:
+        list(IncrementalJsonParser(io.StringIO(text)).events())
+    except ValueError as e:
+        print(f"  {text!r}: {e}")
+# Output:
+#   '{"a": 1 "b": 2}': Unexpected '"b"', expected ',' or a closing bracket
+#   '[1 2]': Unexpected '2', expected ',' or a closing bracket
+#   '[1,,2]': Unexpected ',', expected a value
+#   '["raw\nnewline"]': Invalid JSON near: '"raw\nnewline"]'
+
+# Throughput and peak memory compared with json.load on a big array
+# (employees_compact.json was written in section 44)
+def load_all_items(filename):
+    """Return the number of items json.load() finds in a top-level array"""
+    with open(filename, "r") as jsonfile:
+        return len(json.load(jsonfile))
+
+def stream_all_items(filename):
+    """Return the number of items iter_json_items() yields for a top-level array"""
+    return sum(1 for _ in iter_json_items(filename, "item"))
+
+def peak_memory(func, *args):
+    """Return the peak traced memory in bytes while running func(*args)"""
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+loaded_count, load_time = best_time(load_all_items, "employees_compact.json")
+streamed_count, stream_time = best_time(stream_all_items, "employees_compact.json")
+load_peak = peak_memory(load_all_items, "employees_compact.json")
+stream_peak = peak_memory(stream_all_items, "employees_compact.json")
+print(f"json.load: {loaded_count / load_time:,.0f} items/s, peak {load_peak / 1e6:.1f} MB")
+print(f"iter_json_items: {streamed_count / stream_time:,.0f} items/s, peak {stream_peak / 1e6:.1f} MB")
+os.remove("employees_compact.json")
+
+print("\n===== 47. JSON Lines (.jsonl) Reading and Writing =====")
+# read_config(), update_json_file() and the examples in sections 24, 25 and
+# 28 use one big indented JSON document. Such a file cannot be appended to,
+# split or processed in parallel without parsing all of it.
+# JSON Lines stores one JSON document per line:
+#   {"name": "Rahul", "age": 25, "grade": "A"}
+#   {"name": "Priya", "age": 23, "grade": "B"}
+# - reading: decode one line at a time, only when the caller asks for it
+# - writing: append lines in buffered batches (no rewrite of old data)
+# - parallel: any newline is a record boundary, so byte ranges are easy
+
+def iter_jsonl(filename, skip_invalid=False):
+    """Yield records from a JSON Lines file, decoding each line on demand"""
+    with open(filename, "rb") as jsonlfile:
+        for line_number, line in enumerate(jsonlfile, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)     # json.loads accepts UTF-8 bytes
+            except json.JSONDecodeError as e:
+                if not skip_invalid:
+                    raise ValueError(f"{filename}, line {line_number}: {e}") from None
+
+class JsonlWriter:
+    """Append records to a JSON Lines file in buffered batches"""
+    def __init__(self, filename, mode="a", flush_records=1000, encoding="utf-8"):
+        self.flush_records = flush_records
+        self.records_written = 0
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"),
+                                        default=_encode_default).encode
+        self._lines = []
+        self._file = open(filename, mode, encoding=encoding)
+
+    def write(self, record):
+        """Add one record"""
+        self._lines.append(self._encode(record))
+        if len(self._lines) >= self.flush_records:
+            self.flush()
+
+    def write_many(self, records):
+        """Add every record from an iterable"""
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        """Write buffered lines with one write() call"""
+        if self._lines:
+            self._file.write("\n".join(self._lines) + "\n")
+            self.records_written += len(self._lines)
+            self._lines = []
+        self._file.flush()
+
+    def close(self):
+        """Flush and close the file"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def json_array_to_jsonl(json_filename, jsonl_filename, path="item"):
+    """Convert the items of a JSON document (found at path) to JSON Lines"""
+    with JsonlWriter(jsonl_filename, mode="w") as writer:
+        writer.write_many(iter_json_items(json_filename, path))
+    return writer.records_written
+
+# The worker-side code for parallel reading lives in csv_json_parallel.py
+# (see section 37): parallel_read_jsonl() splits the file into byte ranges
+# that end at newlines and decodes each range in a worker process.
+from csv_json_parallel import count_by_department, parallel_read_jsonl
+
+# Section 24 workflow with JSON Lines: convert once, then stream and append
+json_array_to_jsonl("students_list.json", "students.jsonl")
+grade_a = [s["name"] for s in iter_jsonl("students.jsonl") if s["grade"] == "A"]
+print(f"Students with grade A: {grade_a}")
+with JsonlWriter("students.jsonl") as writer:       # Append, no rewrite
+    writer.write({"name": "Sneha", "age": 24, "grade": "A"})
+print(f"Students after append: {[s['name'] for s in iter_jsonl('students.jsonl')]}")
+# Output: Students after append: ['Rahul', 'Priya', 'Ankit', 'Sneha']
+
+# Range-by-range read of the big JSON Lines file written in section 43
+# (workers=1 reads the ranges in this process; run csv_json_parallel.py for
+# the multi-process version)
+department_counts = {}
+for counts in parallel_read_jsonl("employees_large.jsonl", count_by_department, workers=1):
+    for dept, count in counts.items():
+        department_counts[dept] = department_counts.get(dept, 0) + count
+sequential_counts = count_by_department(iter_jsonl("employees_large.jsonl"))
+print(f"Same department counts: {department_counts == sequential_counts}")
+os.remove("employees_large.jsonl")
+
+print("\n===== 48. Codec Registry for Custom JSON Types =====")
+# DateTimeEncoder (section 22) only knows datetime. A codec registry maps
+# each Python type to an encoder, and each declared field to a decoder:
+# - encoding: json calls default() only for objects it cannot handle; the
+#   registry looks up the encoder by exact type (one dict lookup)
+# - decoding: object_hook converts declared fields while json parses,
+#   so there is no second walk over the loaded data
+# object_hook does not receive the path of a dict, so fields are declared
+# by key name (e.g. "created" matches that key at any depth).
+
+import base64
+import uuid
+from dataclasses import dataclass, field, fields as dataclass_fields, is_dataclass
+from decimal import Decimal
+
+class JsonCodecRegistry:
+    """Type-based encoders and field-based decoders for json"""
+    def __init__(self):
+        self.encoders = {}      # type -> function(obj) -> JSON-compatible value
+        self.decoders = {}      # codec name -> function(value) -> Python object
+
+    def register(self, name, python_type, encode, decode):
+        """Register how one type is encoded and decoded"""
+        self.encoders[python_type] = encode
+        self.decoders[name] = decode
+
+    def default(self, obj):
+        """Encoder hook for json.dump(s)(default=...)"""
+        encode = self.encoders.get(type(obj))
+        if encode is None:
+            if is_dataclass(obj) and not isinstance(obj, type):
+                # Nested values go through default() again if needed
+                return {item.name: getattr(obj, item.name) for item in dataclass_fields(obj)}
+            for base in type(obj).__mro__[1:]:
+                if base in self.encoders:
+                    # Subclass of a registered type: remember it for next time
+                    encode = self.encoders[type(obj)] = self.encoders[base]
+                    break
+            else:
+                raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+        return encode(obj)
+
+    def object_hook(self, field_codecs):
+        """Build an object_hook that decodes {field name: codec name} fields"""
+        field_decoders = [(name, self.decoders[codec]) for name, codec in field_codecs.items()]
+        if len(field_decoders) == 1:
+            # Common case: one declared field, keep the per-dict work minimal
+            [(name, decode)] = field_decoders
+
+            def hook(dct):
+                value = dct.get(name)
+                if value is not None:
+                    dct[name] = decode(value)
+                return dct
+            return hook
+
+        def hook(dct):
+            for name, decode in field_decoders:
+                value = dct.get(name)
+                if value is not None:
+                    dct[name] = decode(value)
+            return dct
+        return hook
+
+    def dumps(self, obj, **kwargs):
+        """json.dumps() with the registered encoders"""
+        return json.dumps(obj, default=self.default, **kwargs)
+
+    def loads(self, text, field_codecs=None, **kwargs):
+        """json.loads() that decodes the declared fields while parsing"""
+        if field_codecs:
+            kwargs["object_hook"] = self.object_hook(field_codecs)
+        return json.loads(text, **kwargs)
+
+    def dump(self, obj, jsonfile, **kwargs):
+        """json.dump() with the registered encoders"""
+        json.dump(obj, jsonfile, default=self.default, **kwargs)
+
+    def load(self, jsonfile, field_codecs=None, **kwargs):
+        """json.load() that decodes the declared fields while parsing"""
+        if field_codecs:
+            kwargs["object_hook"] = self.object_hook(field_codecs)
+        return json.load(jsonfile, **kwargs)
+
+json_codecs = JsonCodecRegistry()
+json_codecs.register("datetime", datetime, datetime.isoformat, datetime.fromisoformat)
+json_codecs.register("date", date, date.isoformat, date.fromisoformat)
+json_codecs.register("decimal", Decimal, str, Decimal)
+json_codecs.register("uuid", uuid.UUID, str, uuid.UUID)
+json_codecs.register("set", set, sorted, set)
+json_codecs.register("frozenset", frozenset, sorted, frozenset)
+json_codecs.register("bytes", bytes, lambda b: base64.b64encode(b).decode("ascii"), base64.b64decode)
+
+@dataclass
+class Payment:
+    """Example record with several custom types"""
+    payment_id: uuid.UUID
+    amount: Decimal
+    paid_on: date
+    tags: set = field(default_factory=set)
+
+payment = Payment(uuid.UUID(int=7), Decimal("1999.90"), date(2024, 3, 15), {"online", "card"})
+text = json_codecs.dumps({"payment": payment, "created": datetime(2024, 3, 15, 10, 30),
+                     "signature": b"\x00\x01"})
+print(f"Encoded: {text}")
+decoded = json_codecs.loads(text, {"created": "datetime", "paid_on": "date", "amount": "decimal",
+                              "payment_id": "uuid", "tags": "set", "signature": "bytes"})
+print(f"Decoded amount: {decoded['payment']['amount']!r}, created: {decoded['created']!r}")
+
+# Decoding many timestamped events: post-processing vs object_hook
+events = [{"id": i, "event": "login", "created": datetime(2024, 1, 1, i % 24, i % 60)}
+          for i in range(BENCHMARK_ROWS)]
+events_text = json_codecs.dumps(events)
+
+def convert_fields(data, field_decoders):
+    """Second pass: walk any nested data and convert the declared fields"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in field_decoders and value is not None:
+                data[key] = field_decoders[key](value)
+            else:
+                convert_fields(value, field_decoders)
+    elif isinstance(data, list):
+        for value in data:
+            convert_fields(value, field_decoders)
+    return data
+
+def decode_then_walk(text):
+    """Load first, then walk the data again to convert timestamps"""
+    return convert_fields(json.loads(text), {"created": datetime.fromisoformat})
+
+def decode_with_hook(text):
+    """Convert timestamps while parsing via object_hook"""
+    return json_codecs.loads(text, {"created": "datetime"})
+
+walked, walk_time = best_time(decode_then_walk, events_text)
+hooked, hook_time = best_time(decode_with_hook, events_text)
+print(f"Load + second pass: {walk_time:.3f}s, object_hook: {hook_time:.3f}s, "
+      f"same result: {walked == hooked == events}")
+
+print("\n===== 49. Append-Only Patch Log for JSON Updates =====")
+# update_json_file() (pattern 4) reads the whole file, updates it and writes
+# the whole file back, so every small update costs as much as the file size,
+# and two writers at the same time can lose each other's changes.
+# A log-structured file keeps:
+# - a base snapshot (the normal JSON file)
+# - a log file next to it with one small JSON patch per line
+# Updates are appended to the log (under a file lock); fsync is done once per
+# batch of updates. Readers load the snapshot and replay the patches.
+# Compaction folds the log into a new snapshot, written to a temporary file
+# and swapped in with os.replace(), then empties the log.
+# A crash in the middle of an append leaves a torn last line; it is cut off
+# when the log is opened again, before anything is appended after it.
+
+import threading
+
+try:
+    import fcntl    # Unix/Linux only
+except ImportError:
+    fcntl = None    # Windows: only threads of this process are kept apart
+
+class JsonPatchLog:
+    """JSON document stored as a snapshot plus an append-only patch log"""
+    def __init__(self, filename, sync_every=32, compact_bytes=1 << 20):
+        self.filename = filename
+        self.log_filename = filename + ".log"
+        self.sync_every = sync_every        # fsync once per this many updates
+        self.compact_bytes = compact_bytes  # Compact when the log is this big
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()     # Used when fcntl is missing
+        self._compacting = None
+        self._log_fd = os.open(self.log_filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._lock_log(self._log_fd)
+        try:
+            self._repair_unlocked()
+        finally:
+            self._unlock_log(self._log_fd)
+
+    def _lock_log(self, fd, exclusive=True):
+        """Lock the log file against other processes (fcntl) or other threads"""
+        if fcntl is None:
+            self._file_lock.acquire()
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _unlock_log(self, fd):
+        """Release the lock taken by _lock_log()"""
+        if fcntl is None:
+            self._file_lock.release()
+        else:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _repair_unlocked(self):
+        """Cut a torn last line off the log (caller holds the file lock)"""
+        end = os.fstat(self._log_fd).st_size
+        if end == 0:
+            return
+        with open(self.log_filename, "rb") as logfile:
+            logfile.seek(end - 1)
+            if logfile.read(1) == b"\n":
+                return
+            # Search backwards for the last complete line, one block at a time
+            while end > 0:
+                start = max(0, end - 65536)
+                logfile.seek(start)
+                newline = logfile.read(end - start).rfind(b"\n")
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+        os.ftruncate(self._log_fd, end)
+        os.fsync(self._log_fd)
+
+    def update(self, updates):
+        """Append a patch (like dict.update) to the log"""
+        line = (json.dumps(updates, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            self._lock_log(self._log_fd)     # Other processes wait here
+            try:
+                os.write(self._log_fd, line)
+                log_size = os.fstat(self._log_fd).st_size
+            finally:
+                self._unlock_log(self._log_fd)
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                os.fsync(self._log_fd)
+                self._unsynced = 0
+        if log_size >= self.compact_bytes:
+            self.compact_in_background()
+
+    def sync(self):
+        """Force pending updates to disk"""
+        with self._lock:
+            if self._unsynced:
+                os.fsync(self._log_fd)
+                self._unsynced = 0
+
+    def _read_unlocked(self):
+        """Load the snapshot and replay the log (caller holds the file lock)"""
+        try:
+            with open(self.filename, "r") as jsonfile:
+                data = json.load(jsonfile)
+        except FileNotFoundError:
+            data = {}
+        with open(self.log_filename, "rb") as logfile:
+            for line in logfile:
+                try:
+                    data.update(json.loads(line))
+                except json.JSONDecodeError:
+                    continue    # Damaged line: skip it, keep the later patches
+        return data
+
+    def read(self):
+        """Return the current document (snapshot + all patches)"""
+        with open(self.log_filename, "rb") as lockfile:
+            self._lock_log(lockfile.fileno(), exclusive=False)
+            try:
+                return self._read_unlocked()
+            finally:
+                self._unlock_log(lockfile.fileno())
+
+    def compact(self):
+        """Fold the log into a new snapshot and empty the log"""
+        with open(self.log_filename, "rb+") as logfile:
+            self._lock_log(logfile.fileno())
+            try:
+                data = self._read_unlocked()
+                temp_filename = f"{self.filename}.{os.getpid()}.tmp"
+                with open(temp_filename, "w") as jsonfile:
+                    json.dump(data, jsonfile, indent=2)
+                    jsonfile.flush()
+                    os.fsync(jsonfile.fileno())
+                os.replace(temp_filename, self.filename)
+                # The rename must reach the disk before the log is emptied,
+                # or a crash could bring back the old snapshot with no log
+                if hasattr(os, "O_DIRECTORY"):     # Not available on Windows
+                    directory = os.path.dirname(os.path.abspath(self.filename))
+                    dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+                    try:
+                        os.fsync(dir_fd)
+                    finally:
+                        os.close(dir_fd)
+                # Patches only set keys, so replaying them again after a crash
+                # between these two steps gives the same document
+                logfile.truncate(0)
+                os.fsync(logfile.fileno())
+            finally:
+                self._unlock_log(logfile.fileno())
+
+    def compact_in_background(self):
+        """Start compaction in a thread unless one is already running"""
+        with self._lock:
+            if self._compacting is not None and self._compacting.is_alive():
+                return self._compacting
+            self._compacting = threading.Thread(target=self.compact, daemon=True)
+            self._compacting.start()
+            return self._compacting
+
+    def close(self):
+        """Sync pending updates, wait for compaction and close the log"""
+        if self._compacting is not None:
+            self._compacting.join()
+        self.sync()
+        os.close(self._log_fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Same usage as update_json_file(), but each update is a small append
+with open("settings_log.json", "w") as jsonfile:
+    json.dump(app_settings, jsonfile, indent=2)
+for name in ("settings_log.json.log", "big_logged.json.log"):
+    if os.path.exists(name):
+        os.remove(name)     # Start the examples with empty logs
+with JsonPatchLog("settings_log.json") as settings_log:
+    settings_log.update({"theme": "light"})
+    settings_log.update({"language": "hi"})
+    print(f"Theme: {settings_log.read()['theme']}, language: {settings_log.read()['language']}")
+    settings_log.compact()
+print(f"After compaction the log is empty: {os.path.getsize('settings_log.json.log') == 0}")
+with open("settings_log.json", "r") as jsonfile:
+    print(f"Snapshot theme: {json.load(jsonfile)['theme']}")
+# Output: Snapshot theme: light
+
+# A crash in the middle of an append leaves half a line at the end of the log
+with open("settings_log.json.log", "ab") as logfile:
+    logfile.write(b'{"theme":"da')
+with JsonPatchLog("settings_log.json") as settings_log:   # Cuts the torn line off
+    settings_log.update({"font_size": 16})
+    repaired = settings_log.read()
+print(f"After a torn append - theme: {repaired['theme']}, font size: {repaired['font_size']}")
+# Output: After a torn append - theme: light, font size: 16
+
+# Update latency as the document grows: rewrite vs append
+big_document = {f"key_{i}": {"value": i, "label": f"item {i}"} for i in range(BENCHMARK_ROWS)}
+for name in ("big_rewrite.json", "big_logged.json"):
+    with open(name, "w") as jsonfile:
+        json.dump(big_document, jsonfile, indent=2)
+
+start = time.perf_counter()
+for i in range(20):
+    update_json_file("big_rewrite.json", {f"key_{i}": {"value": -i}})
+rewrite_latency = (time.perf_counter() - start) / 20
+with JsonPatchLog("big_logged.json") as big_log:
+    start = time.perf_counter()
+    for i in range(20):
+        big_log.update({f"key_{i}": {"value": -i}})
+    log_latency = (time.perf_counter() - start) / 20
+    same = big_log.read() == read_config("big_rewrite.json")
+print(f"update_json_file: {rewrite_latency * 1000:.2f} ms/update, "
+      f"patch log: {log_latency * 1000:.3f} ms/update, same document: {same}")
+for name in ("big_rewrite.json", "big_logged.json", "big_logged.json.log"):
+    os.remove(name)
+
+print("\n===== 50. Cached, Hot-Reloading Configuration =====")
+# read_config() (pattern 3) opens and parses the file on every call. When it
+# is called for every request, almost all of that work is wasted.
+# A config cache:
+# - parses the file once and hands out a read-only snapshot
+# - re-checks os.stat() (size, mtime, inode) at most every `interval` seconds
+# - reloads in a background thread when the file changed; readers keep using
+#   the old snapshot until the new one is swapped in with one assignment
+# - counts hits, misses (stat checks) and reloads
+
+from types import MappingProxyType
+
+def freeze(value):
+    """Return a read-only copy of nested dicts/lists (MappingProxyType/tuple)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """Return a normal, mutable copy of a frozen value (dicts and lists)"""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+class ConfigCache:
+    """Parse a JSON config once and reload it only when the file changes"""
+    def __init__(self, filename, interval=1.0, background=True):
+        self.filename = filename
+        self.interval = interval
+        self.background = background
+        self.stats = {"hits": 0, "misses": 0, "reloads": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._signature, self._snapshot = self._load()
+        self._next_check = time.monotonic() + interval
+
+    def _file_signature(self):
+        stat = os.stat(self.filename)
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def _load(self):
+        """Read and freeze the file, returning (signature, snapshot)"""
+        signature = self._file_signature()
+        with open(self.filename, "r") as jsonfile:
+            return signature, freeze(json.load(jsonfile))
+
+    def _reload(self):
+        try:
+            signature, snapshot = self._load()
+            # One assignment: readers see either the old or the new snapshot
+            self._signature, self._snapshot = signature, snapshot
+            self.stats["reloads"] += 1
+        except (OSError, json.JSONDecodeError):
+            # Half-written or missing file: keep serving the last good config
+            self.stats["errors"] += 1
+        finally:
+            self._reloading = False
+
+    def get(self):
+        """Return the current read-only config snapshot"""
+        now = time.monotonic()
+        if now < self._next_check:
+            self.stats["hits"] += 1
+            return self._snapshot
+        with self._lock:
+            if now >= self._next_check:
+                self._next_check = now + self.interval
+                self.stats["misses"] += 1
+                try:
+                    changed = self._file_signature() != self._signature
+                except OSError:
+                    changed = False
+                    self.stats["errors"] += 1
+                if changed and not self._reloading:
+                    self._reloading = True
+                    if self.background:
+                        threading.Thread(target=self._reload, daemon=True).start()
+                    else:
+                        self._reload()
+            else:
+                self.stats["hits"] += 1
+        return self._snapshot
+
+    def to_dict(self):
+        """Return the current config as a new mutable dict (like read_config())"""
+        return thaw(self.get())
+
+_config_caches = {}
+
+def read_config_cached(filename, interval=1.0):
+    """Cached version of read_config() that returns a read-only snapshot
+
+    Dicts in the snapshot are MappingProxyType and lists are tuples, so code
+    that changes the result needs a copy: use ConfigCache.to_dict() or thaw().
+    """
+    cache = _config_caches.get(filename)
+    if cache is None:
+        cache = _config_caches[filename] = ConfigCache(filename, interval)
+    return cache.get()
+
+# Repeated calls are served from memory
+config_cache = ConfigCache("config.json", interval=0.05, background=False)
+for _ in range(1000):
+    current = config_cache.get()
+print(f"App: {current['app_name']}, DB port: {current['database']['port']}")
+try:
+    current["version"] = "2.0"
+except TypeError as e:
+    print(f"Snapshots are read-only: {e}")
+
+# Change the file: the next check after the interval picks it up
+updated_config = read_config("config.json")
+updated_config["settings"]["debug"] = False
+with open("config.json.tmp", "w") as jsonfile:
+    json.dump(updated_config, jsonfile, indent=4)
+os.replace("config.json.tmp", "config.json")       # Atomic swap, new inode
+time.sleep(0.06)
+print(f"Debug after reload: {config_cache.get()['settings']['debug']}")
+print(f"Counters: {config_cache.stats}")
+
+# A mutable copy, e.g. to change a setting and save it with json.dump
+editable = config_cache.to_dict()
+editable["version"] = "2.0"
+print(f"Copy is a {type(editable).__name__}, snapshot version: {config_cache.get()['version']}")
+
+# Per-call cost compared with read_config()
+start = time.perf_counter()
+for _ in range(1000):
+    read_config("config.json")
+uncached_time = (time.perf_counter() - start) / 1000
+start = time.perf_counter()
+for _ in range(1000):
+    read_config_cached("config.json")
+cached_time = (time.perf_counter() - start) / 1000
+print(f"read_config: {uncached_time * 1e6:.1f} us/call, cached: {cached_time * 1e6:.2f} us/call")
+
+print("\n===== 51. Compiled JSON Schema Validation =====")
+# Section 32 shows a schema but needs the jsonschema library to use it.
+# A small validator for the same kind of schema can be written with the
+# standard library. To make it fast, the schema is "compiled" once into
+# nested functions (closures): each function checks one part of the schema,
+# regular expressions are compiled up front, and validating a document never
+# looks at the schema dict again.
+# Supported keywords: type, properties, required, additionalProperties,
+# items, minItems, maxItems, minimum, maximum, exclusiveMinimum,
+# exclusiveMaximum, minLength, maxLength, pattern, format, enum.
+
+class SchemaValidationError(ValueError):
+    """Raised for a document that does not match the schema"""
+    def __init__(self, path, message):
+        super().__init__(f"{path}: {message}")
+        self.path = path
+        self.message = message
+
+class _StopAtFirstError:
+    """Error collector for fail-fast mode: the first error is raised"""
+    def append(self, error):
+        raise error
+
+SCHEMA_FORMATS = {
+    "email": re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$").match,
+    "date": re.compile(r"^\d{4}-\d{2}-\d{2}$").match,
+    "date-time": re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?"
+                            r"(Z|[+-]\d{2}:\d{2})?$").match,
+    "uuid": re.compile(r"^[0-9a-fA-F]{8}-([0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}$").match,
+}
+
+def _is_integer(value):
+    """JSON integers may also be written as 1.0"""
+    return (type(value) is int) or (type(value) is float and value.is_integer())
+
+SCHEMA_TYPES = {
+    "string": lambda value: type(value) is str,
+    "integer": _is_integer,
+    "number": lambda value: type(value) in (int, float),
+    "boolean": lambda value: type(value) is bool,
+    "object": lambda value: type(value) is dict,
+    "array": lambda value: type(value) is list,
+    "null": lambda value: value is None,
+}
+
+def _compile_node(schema):
+    """Compile one schema node into (type check or None, other checks)
+
+    Every check is a function check(value, path, errors).
+    """
+    check_type = None
+    checks = []
+    add = checks.append
+
+    if "type" in schema:
+        names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        testers = [SCHEMA_TYPES[name] for name in names]
+        expected = " or ".join(names)
+        if len(testers) == 1:
+            [is_type] = testers
+        else:
+            def is_type(value):
+                return any(test(value) for test in testers)
+
+        def check_type(value, path, errors):
+            if not is_type(value):
+                errors.append(SchemaValidationError(path, f"expected {expected}, got {type(value).__name__}"))
+                return False
+            return True
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append(SchemaValidationError(path, f"{value!r} is not one of {allowed}"))
+        add(check_enum)
+
+    number_type = (int, float)
+    for keyword, compare, text in (("minimum", operator.lt, "less than"),
+                                   ("maximum", operator.gt, "greater than"),
+                                   ("exclusiveMinimum", operator.le, "less than or equal to"),
+                                   ("exclusiveMaximum", operator.ge, "greater than or equal to")):
+        if keyword in schema:
+            def check_bound(value, path, errors, limit=schema[keyword], compare=compare, text=text):
+                if type(value) in number_type and compare(value, limit):
+                    errors.append(SchemaValidationError(path, f"{value} is {text} {limit}"))
+            add(check_bound)
+
+    if "minLength" in schema or "maxLength" in schema:
+        min_length = schema.get("minLength", 0)
+        max_length = schema.get("maxLength", float("inf"))
+
+        def check_length(value, path, errors):
+            if type(value) is str and not min_length <= len(value) <= max_length:
+                errors.append(SchemaValidationError(
+                    path, f"length {len(value)} not in [{min_length}, {max_length}]"))
+        add(check_length)
+
+    for keyword in ("pattern", "format"):
+        if keyword in schema:
+            if keyword == "pattern":
+                matcher = re.compile(schema["pattern"]).search
+            elif schema["format"] in SCHEMA_FORMATS:
+                matcher = SCHEMA_FORMATS[schema["format"]]
+            else:
+                continue    # Unknown formats are ignored, like jsonschema does
+            label = f"{keyword} {schema[keyword]!r}"
+
+            def check_text(value, path, errors, matcher=matcher, label=label):
+                if type(value) is str and not matcher(value):
+                    errors.append(SchemaValidationError(path, f"{value!r} does not match {label}"))
+            add(check_text)
+
+    if "properties" in schema or "required" in schema or "additionalProperties" in schema:
+        properties = [(name, "." + name, _compile_validator(sub_schema))
+                      for name, sub_schema in schema.get("properties", {}).items()]
+        required = schema.get("required", [])
+        known = set(schema.get("properties", {}))
+        no_extra = schema.get("additionalProperties", True) is False
+
+        def check_object(value, path, errors):
+            if type(value) is not dict:
+                return
+            for name in required:
+                if name not in value:
+                    errors.append(SchemaValidationError(path, f"missing required property '{name}'"))
+            for name, suffix, validate in properties:
+                if name in value:
+                    validate(value[name], path + suffix, errors)
+            if no_extra and not known.issuperset(value):
+                extra = sorted(set(value) - known)
+                errors.append(SchemaValidationError(path, f"unexpected properties {extra}"))
+        add(check_object)
+
+    if "items" in schema or "minItems" in schema or "maxItems" in schema:
+        validate_item = _compile_validator(schema["items"]) if "items" in schema else None
+        min_items = schema.get("minItems", 0)
+        max_items = schema.get("maxItems", float("inf"))
+
+        def check_array(value, path, errors):
+            if type(value) is not list:
+                return
+            if not min_items <= len(value) <= max_items:
+                errors.append(SchemaValidationError(
+                    path, f"{len(value)} items, expected [{min_items}, {max_items}]"))
+            if validate_item is not None:
+                for index, item in enumerate(value):
+                    validate_item(item, f"{path}[{index}]", errors)
+        add(check_array)
+    return check_type, checks
+
+def _compile_validator(schema):
+    """Combine the checks of a schema node into a single function"""
+    check_type, checks = _compile_node(schema)
+    if check_type is not None:
+        def validate(value, path, errors):
+            # Other keywords are skipped when the type is already wrong
+            if check_type(value, path, errors):
+                for check in checks:
+                    check(value, path, errors)
+        return validate
+
+    def validate(value, path, errors):
+        for check in checks:
+            check(value, path, errors)
+    return validate
+
+class CompiledSchema:
+    """A JSON schema compiled into Python functions"""
+    def __init__(self, schema):
+        self.schema = schema
+        self._validate = _compile_validator(schema)
+        self._stop = _StopAtFirstError()
+
+    def validate(self, document):
+        """Raise SchemaValidationError for the first problem (fail-fast)"""
+        self._validate(document, "$", self._stop)
+
+    def is_valid(self, document):
+        """Return True if the document matches the schema"""
+        try:
+            self._validate(document, "$", self._stop)
+            return True
+        except SchemaValidationError:
+            return False
+
+    def errors(self, document):
+        """Return every problem in the document (collect-all mode)"""
+        errors = []
+        self._validate(document, "$", errors)
+        return errors
+
+    def validate_many(self, documents, collect_all=False):
+        """Yield (index, errors) for each invalid document of a list or stream"""
+        validate, stop = self._validate, self._stop
+        for index, document in enumerate(documents):
+            if collect_all:
+                errors = []
+                validate(document, "$", errors)
+                if errors:
+                    yield index, errors
+            else:
+                try:
+                    validate(document, "$", stop)
+                except SchemaValidationError as error:
+                    yield index, [error]
+
+user_schema = CompiledSchema(schema_example)
+print(f"Valid user: {user_schema.is_valid({'name': 'Rahul', 'age': 25, 'email': 'rahul@example.com'})}")
+try:
+    user_schema.validate({"name": "Priya", "age": -3})
+except SchemaValidationError as e:
+    print(f"Fail-fast error: {e}")
+# Output: Fail-fast error: $.age: -3 is less than 0
+bad_user = {"name": 42, "email": "not-an-email"}
+print(f"All errors: {[str(error) for error in user_schema.errors(bad_user)]}")
+
+# Nested schema with arrays, checking the API response from section 28
+response_schema = CompiledSchema({
+    "type": "object",
+    "required": ["status", "data"],
+    "properties": {
+        "status": {"enum": ["success", "error"]},
+        "data": {
+            "type": "object",
+            "properties": {
+                "users": {"type": "array", "items": {
+                    "type": "object",
+                    "required": ["id", "name", "email"],
+                    "properties": {"id": {"type": "integer", "minimum": 1},
+                                   "name": {"type": "string", "minLength": 1},
+                                   "email": {"type": "string", "format": "email"}},
+                }},
+                "total": {"type": "integer"},
+            },
+        },
+    },
+})
+print(f"API response valid: {response_schema.is_valid(api_response)}")
+
+# Bulk validation throughput
+documents = [{"name": f"User{i}", "age": i % 90, "email": f"user{i}@example.com"}
+             for i in range(BENCHMARK_ROWS)]
+documents[500]["age"] = -1
+start = time.perf_counter()
+invalid = list(user_schema.validate_many(documents))
+elapsed = time.perf_counter() - start
+print(f"Validated {len(documents)} documents at {len(documents) / elapsed:,.0f} docs/sec, "
+      f"invalid: {[(index, str(errors[0])) for index, errors in invalid]}")
+
+print("\n===== 52. Indexed Record Collections =====")
+# Section 24 filters students with a list comprehension and groups them with
+# defaultdict: every query scans every record. For many different queries
+# over the same data, indexes pay off (like indexes in a database):
+# - hash index:   value -> record ids, for == / in / group_by / count
+# - sorted index: values kept sorted, so <, <=, >, >= use binary search
+# Queries use the same condition format as section 40, e.g.
+#   ("and", ("grade", "==", "A"), ("age", "<", 25))
+# Conditions on fields without an index are checked only on the records
+# that the indexed conditions already selected.
+# A column can hold values of different types (e.g. read_typed_csv() widens
+# an int column to text when it meets "unknown"). Values that cannot be
+# compared with each other are kept in separate sorted groups, and a query
+# only searches the group of its literal: a full scan also finds no match
+# when comparing "unknown" < 30 raises TypeError.
+
+import numbers
+from bisect import bisect_left, bisect_right
+
+def _order_group(value):
+    """Return the key of the sorted group that value belongs to"""
+    if isinstance(value, (numbers.Real, Decimal)):
+        return "number"     # int, float, bool and Decimal compare with each other
+    return type(value)
+
+class RecordCollection:
+    """In-memory records with hash and sorted indexes for fast queries"""
+    def __init__(self, records=(), hash_fields=(), sorted_fields=()):
+        self.records = []
+        self.hash_indexes = {name: {} for name in hash_fields}
+        # name -> {group: (values, ids)}, or group: None if its values have no order
+        self.sorted_indexes = {name: {} for name in sorted_fields}
+        self.extend(records)
+
+    @classmethod
+    def from_json(cls, filename, path="item", **index_options):
+        """Load records from a JSON array (or the items at path)"""
+        return cls(iter_json_items(filename, path), **index_options)
+
+    @classmethod
+    def from_csv(cls, filename, **index_options):
+        """Load typed records from a CSV file (types detected once, section 42)"""
+        return cls(read_typed_csv(filename), **index_options)
+
+    def extend(self, records):
+        """Add many records; each sorted index is rebuilt with one sort"""
+        first_id = len(self.records)
+        self.records.extend(records)
+        records = self.records
+        for name, index in self.hash_indexes.items():
+            for record_id in range(first_id, len(records)):
+                index.setdefault(records[record_id].get(name), []).append(record_id)
+        for name, groups in self.sorted_indexes.items():
+            entries = {}
+            for record_id, record in enumerate(records):
+                value = record.get(name)
+                entries.setdefault(_order_group(value), []).append((value, record_id))
+            groups.clear()
+            for group, group_entries in entries.items():
+                # The sort is stable, so equal values keep their ids in order
+                try:
+                    group_entries.sort(key=operator.itemgetter(0))
+                except TypeError:
+                    groups[group] = None    # e.g. None or dicts: queries scan instead
+                    continue
+                groups[group] = ([value for value, _ in group_entries],
+                                 [record_id for _, record_id in group_entries])
+
+    def add(self, record):
+        """Add one record and update every index (use extend() for many)"""
+        record_id = len(self.records)
+        self.records.append(record)
+        for name, index in self.hash_indexes.items():
+            index.setdefault(record.get(name), []).append(record_id)
+        for name, groups in self.sorted_indexes.items():
+            value = record.get(name)
+            group = _order_group(value)
+            if group not in groups:
+                groups[group] = ([value], [record_id])
+                continue
+            if groups[group] is None:
+                continue
+            values, ids = groups[group]
+            try:
+                if value >= values[-1]:
+                    values.append(value)    # Fast path for data loaded in order
+                    ids.append(record_id)
+                else:
+                    position = bisect_right(values, value)
+                    values.insert(position, value)
+                    ids.insert(position, record_id)
+            except TypeError:
+                groups[group] = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def _index_lookup(self, condition):
+        """Return the ids (a list) for a condition using an index, or None"""
+        name, op, literal = condition
+        hash_index = self.hash_indexes.get(name)
+        if hash_index is not None and op in ("==", "in"):
+            try:
+                if op == "==":
+                    return hash_index.get(literal, [])
+                ids = []
+                for option in literal:
+                    ids.extend(hash_index.get(option, ()))
+                return ids
+            except TypeError:
+                return None     # Unhashable literal: scan instead
+        if name in self.sorted_indexes and op in ("==", "<", "<=", ">", ">="):
+            return self._sorted_lookup(name, [(op, literal)])
+        return None
+
+    def _sorted_lookup(self, name, bounds):
+        """Return the ids whose value meets every (op, literal) bound, or None
+
+        Several bounds on one field (e.g. >= 100 and < 200) become a single
+        slice of the sorted index instead of two big id lists.
+        """
+        literal_groups = {_order_group(literal) for _, literal in bounds}
+        if len(literal_groups) > 1:
+            return []   # No value can be compared with all of the literals
+        # Other groups cannot be compared with the literal, so they never match
+        group = self.sorted_indexes[name].get(literal_groups.pop(), ([], []))
+        if group is None:
+            return None
+        values, ids = group
+        low, high = 0, len(values)
+        try:
+            for op, literal in bounds:
+                if op in ("==", ">="):
+                    low = max(low, bisect_left(values, literal))
+                elif op == ">":
+                    low = max(low, bisect_right(values, literal))
+                if op in ("==", "<="):
+                    high = min(high, bisect_right(values, literal))
+                elif op == "<":
+                    high = min(high, bisect_left(values, literal))
+        except TypeError:
+            return None     # e.g. a lone None value: scan instead
+        return ids[low:high]
+
+    def _matches(self, record, condition):
+        """Check one record against a condition without indexes"""
+        if condition[0] in ("and", "or"):
+            test = all if condition[0] == "and" else any
+            return test(self._matches(record, part) for part in condition[1:])
+        name, op, literal = condition
+        value = record.get(name)
+        try:
+            return FILTER_OPERATORS[op](value, literal)
+        except TypeError:
+            return False    # e.g. comparing None with a number
+
+    def _match_ids(self, condition, candidates=None):
+        """Return the set of matching ids, restricted to candidates if given"""
+        if condition[0] == "and":
+            ids = candidates
+            indexed = []
+            unindexed = []
+            bounds = {}     # sorted field -> range conditions on it
+            for part in condition[1:]:
+                if (part[0] in self.sorted_indexes and part[1] in ("<", "<=", ">", ">=")
+                        or part[1] == "==" and part[0] in self.sorted_indexes
+                        and part[0] not in self.hash_indexes):
+                    bounds.setdefault(part[0], []).append(part)
+                    continue
+                found = None if part[0] in ("and", "or") else self._index_lookup(part)
+                if found is None:
+                    unindexed.append(part)
+                else:
+                    indexed.append((len(found), found, part))
+            for name, parts in bounds.items():
+                found = self._sorted_lookup(name, [part[1:] for part in parts])
+                if found is None:
+                    unindexed.extend(parts)
+                else:
+                    indexed.append((len(found), found, ("and", *parts)))
+            # Smallest index result first: each step can only shrink the set
+            records = self.records
+            for size, found, part in sorted(indexed, key=operator.itemgetter(0)):
+                if ids is None:
+                    ids = set(found)
+                elif size <= 8 * len(ids):
+                    ids = ids.intersection(found)
+                else:
+                    # Much bigger than the current candidates: check those instead
+                    ids = {i for i in ids if self._matches(records[i], part)}
+            for part in unindexed:
+                ids = self._match_ids(part, ids)
+            return ids if ids is not None else set(range(len(self.records)))
+        if condition[0] == "or":
+            ids = set()
+            for part in condition[1:]:
+                ids |= self._match_ids(part, candidates)
+            return ids
+        found = self._index_lookup(condition)
+        if found is not None:
+            return set(found) if candidates is None else candidates.intersection(found)
+        # No index for this field: scan only the candidate records
+        records = self.records
+        scan = range(len(records)) if candidates is None else candidates
+        return {i for i in scan if self._matches(records[i], condition)}
+
+    def where(self, condition):
+        """Return the matching records in their original order"""
+        records = self.records
+        return [records[i] for i in sorted(self._match_ids(condition))]
+
+    def count(self, condition=None):
+        """Count matching records (all records if no condition)"""
+        if condition is None:
+            return len(self.records)
+        return len(self._match_ids(condition))
+
+    def group_by(self, name, condition=None):
+        """Group (matching) records by a field: {value: [records]}"""
+        records = self.records
+        selected = None if condition is None else self._match_ids(condition)
+        if name in self.hash_indexes:
+            groups = {}
+            for value, ids in self.hash_indexes[name].items():
+                chosen = ids if selected is None else [i for i in ids if i in selected]
+                if chosen:
+                    groups[value] = [records[i] for i in chosen]
+            return groups
+        groups = {}
+        for i in (range(len(records)) if selected is None else sorted(selected)):
+            groups.setdefault(records[i].get(name), []).append(records[i])
+        return groups
+
+# Section 24 queries on an indexed collection
+students_index = RecordCollection.from_json("students_list.json",
+                                             hash_fields=["grade"], sorted_fields=["age"])
+print(f"Grade A: {[s['name'] for s in students_index.where(('grade', '==', 'A'))]}")
+print(f"Age < 25: {[s['name'] for s in students_index.where(('age', '<', 25))]}")
+print(f"Grade A and age >= 25: "
+      f"{[s['name'] for s in students_index.where(('and', ('grade', '==', 'A'), ('age', '>=', 25)))]}")
+grouped = students_index.group_by("grade")
+print(f"Grouped by grade: { {grade: [s['name'] for s in group] for grade, group in grouped.items()} }")
+# Output: Grouped by grade: {'A': ['Rahul', 'Ankit'], 'B': ['Priya']}
+
+# Mixed types in one column: only comparable values can match, as in a scan
+mixed_ages = RecordCollection([{"age": 25}, {"age": "unknown"}, {"age": 31}],
+                              sorted_fields=["age"])
+print(f"Age > 30: {mixed_ages.where(('age', '>', 30))}, "
+      f"age == 'unknown': {mixed_ages.count(('age', '==', 'unknown'))}")
+# Output: Age > 30: [{'age': 31}], age == 'unknown': 1
+
+# Many different queries over the same employees (BENCHMARK_ROWS of them).
+# Two bounds on one field (a salary band) are a single slice of its index.
+# Indexes help most when a query selects few records; a broad query (say a
+# quarter of all records) still builds big id sets and gains only ~3x.
+employees_index = RecordCollection.from_csv("employees_large.csv",
+                                            hash_fields=["Department", "City", "Status"],
+                                            sorted_fields=["Salary", "Age"])
+queries = [("and", ("Department", "==", dept), ("Salary", ">=", low), ("Salary", "<", low + 1000))
+           for dept in ("IT", "HR", "Finance", "Sales", "Marketing")
+           for low in range(100000, 150000, 2500)]
+start = time.perf_counter()
+indexed_counts = [employees_index.count(query) for query in queries]
+indexed_time = time.perf_counter() - start
+start = time.perf_counter()
+scan_counts = [sum(1 for e in employees_index.records
+                   if e["Department"] == dept and low <= e["Salary"] < high)
+               for _, (_, _, dept), (_, _, low), (_, _, high) in queries]
+scan_time = time.perf_counter() - start
+print(f"{len(queries)} queries - full scans: {scan_time:.3f}s, indexes: {indexed_time:.3f}s, "
+      f"same counts: {indexed_counts == scan_counts}")
+
+# employees_large.csv is not used after this section: remove it and the
+# index and schema files written next to it (sections 38 and 42)
+for name in ("employees_large.csv", "employees_large.csv.idx.json",
+             "employees_large.csv.schema.json"):
+    os.remove(name)
+
+print("\n===== 53. Streaming the API Response Envelope =====")
+# Section 28 builds the whole api_response dict and dumps it at once. With
+# 500k users that is one huge list, one huge string, and nothing can be sent
+# until all of it is ready.
+# A streaming serializer writes the envelope around a generator of users:
+#   {"status": "success", "data": {"users": [   <- sent immediately
+#     ...users, encoded and sent in chunks...
+#   ], "total": N}, "message": "..."}           <- total counted on the way
+# Pagination helpers pick one page of users by offset or after a cursor.
+
+from itertools import dropwhile, islice
+
+def paginate(items, page_size, offset=0, after=None, key="id"):
+    """Return an iterator over one page: by offset, or after a cursor value
+
+    For cursor pagination the items must be sorted by key.
+    """
+    items = iter(items)
+    if after is not None:
+        items = dropwhile(lambda item: item[key] <= after, items)
+    return islice(items, offset, offset + page_size)
+
+def iter_api_response(users, status="success", message="Users retrieved successfully",
+                      chunk_size=500, page_size=None, cursor_key="id"):
+    """Yield the JSON text of an API response envelope in chunks
+
+    If page_size is given, "next_cursor" is added: the cursor_key of the last
+    user when the page is full (more may follow), otherwise null.
+    """
+    encode = json.JSONEncoder(ensure_ascii=False, default=json_codecs.default).encode
+    yield f'{{"status": {encode(status)}, "data": {{"users": ['
+    total = 0
+    last_user = None
+    chunk = []
+    for user in users:
+        chunk.append(encode(user))
+        last_user = user
+        if len(chunk) >= chunk_size:
+            yield ("" if total == 0 else ", ") + ", ".join(chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        yield ("" if total == 0 else ", ") + ", ".join(chunk)
+        total += len(chunk)
+    tail = f'], "total": {total}'
+    if page_size is not None:
+        next_cursor = last_user[cursor_key] if total == page_size and last_user else None
+        tail += f', "next_cursor": {encode(next_cursor)}'
+    yield f'{tail}}}, "message": {encode(message)}}}'
+
+def write_api_response(filename, users, **options):
+    """Stream an API response envelope into a file; return the user count"""
+    count = 0
+
+    def counted(items):
+        nonlocal count
+        for item in items:
+            count += 1
+            yield item
+
+    with open(filename, "w", encoding="utf-8") as jsonfile:
+        for chunk in iter_api_response(counted(users), **options):
+            jsonfile.write(chunk)
+    return count
+
+# Same document as section 28
+streamed_text = "".join(iter_api_response(api_response["data"]["users"]))
+print(f"Same as api_response: {json.loads(streamed_text) == api_response}")
+
+# Pages of a big user list (generated lazily)
+def generate_users(count):
+    """Yield users with increasing ids"""
+    for user_id in range(1, count + 1):
+        yield {"id": user_id, "name": f"User{user_id}", "email": f"user{user_id}@example.com"}
+
+page = json.loads("".join(iter_api_response(paginate(generate_users(10), 4, after=4),
+                                            page_size=4)))
+print(f"Page after id 4: {[u['id'] for u in page['data']['users']]}, "
+      f"next_cursor: {page['data']['next_cursor']}")
+# Output: Page after id 4: [5, 6, 7, 8], next_cursor: 8
+
+# Time to first byte and peak memory for many users
+user_count = 2 * BENCHMARK_ROWS
+start = time.perf_counter()
+chunks = iter_api_response(generate_users(user_count))
+next(chunks)
+first_byte = time.perf_counter() - start
+for _ in chunks:
+    pass
+
+def dump_whole_response(filename, count):
+    """Build the full response dict and json.dump it (section 28 style)"""
+    response = {"status": "success",
+                "data": {"users": list(generate_users(count)), "total": count},
+                "message": "Users retrieved successfully"}
+    with open(filename, "w") as jsonfile:
+        json.dump(response, jsonfile)
+
+dump_peak = peak_memory(dump_whole_response, "api_full.json", user_count)
+stream_peak = peak_memory(write_api_response, "api_streamed.json", generate_users(user_count))
+with open("api_full.json") as full, open("api_streamed.json") as streamed:
+    same = json.load(full) == json.load(streamed)
+print(f"First chunk after {first_byte * 1000:.3f} ms; peak memory - dict: {dump_peak / 1e6:.1f} MB, "
+      f"streaming: {stream_peak / 1e6:.1f} MB, same JSON: {same}")
+os.remove("api_full.json")
+os.remove("api_streamed.json")
+
+print("\n===== 54. Compact Binary Record Format =====")
+# JSON repeats every key name in every record and stores numbers as text.
+# For long lists of flat records with the same fields (employees, students)
+# a simple binary format is much smaller:
+# - header: magic bytes + the schema (field names and types) stored once
+# - each record: its length (varint) followed by the field values
+#   int   -> zigzag varint (small numbers take 1-2 bytes)
+#   float -> 8-byte IEEE double (struct '<d')
+#   str   -> varint length + UTF-8 bytes
+#   bool  -> 1 byte
+#   json  -> varint length + JSON text (None or anything else)
+#   a "?" type (e.g. "int?") allows None: one byte 0 for None, or 1 + value
+# The length prefix lets the reader stream records chunk by chunk.
+# The schema is inferred from all records: a field with values of different
+# types is stored as json (which keeps 1 and 1.0 apart, unlike float).
+
+import tempfile
+
+RECORD_MAGIC = b"RECBIN1\n"
+FLOAT64 = struct.Struct("<d")
+
+def encode_varint(number, out):
+    """Append an unsigned integer as a varint (7 bits per byte)"""
+    while number >= 0x80:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+def decode_varint(data, pos):
+    """Read a varint at data[pos]; return (number, new position)"""
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1        # Fast path: one byte
+    number = byte & 0x7F
+    shift = 7
+    while True:
+        pos += 1
+        byte = data[pos]
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, pos + 1
+        shift += 7
+
+def _encode_int(value, out):
+    encode_varint(value * 2 if value >= 0 else -value * 2 - 1, out)    # zigzag
+
+def _encode_float(value, out):
+    out += FLOAT64.pack(value)
+
+def _encode_str(value, out):
+    encoded = value.encode("utf-8")
+    encode_varint(len(encoded), out)
+    out += encoded
+
+def _decode_str(data, pos):
+    length, pos = decode_varint(data, pos)
+    return data[pos:pos + length].decode("utf-8"), pos + length
+
+def _encode_bool(value, out):
+    out.append(1 if value else 0)
+
+def _encode_json(value, out):
+    _encode_str(json.dumps(value), out)
+
+def _decode_json(data, pos):
+    text, pos = _decode_str(data, pos)
+    return json.loads(text), pos
+
+RECORD_ENCODERS = {
+    "int": _encode_int,
+    "float": _encode_float,
+    "str": _encode_str,
+    "bool": _encode_bool,
+    "json": _encode_json,
+}
+
+def record_encoder(kind):
+    """Return the encoder for a schema type, adding a None flag for "int?" etc."""
+    encode = RECORD_ENCODERS[kind.rstrip("?")]
+    if not kind.endswith("?"):
+        return encode
+
+    def encode_nullable(value, out):
+        if value is None:
+            out.append(0)
+        else:
+            out.append(1)
+            encode(value, out)
+    return encode_nullable
+
+_VARINT_SOURCE = """\
+    byte = data[pos]
+    if byte < 0x80:
+        {target} = byte
+        pos += 1
+    else:
+        {target}, pos = decode_varint(data, pos)
+"""
+
+_FIELD_SOURCE = {
+    "int": _VARINT_SOURCE.format(target="number")
+           + "    value_{i} = (number >> 1) if not number & 1 else -((number + 1) >> 1)\n",
+    "float": "    value_{i} = unpack_float(data, pos)[0]\n    pos += 8\n",
+    "str": _VARINT_SOURCE.format(target="length")
+           + "    value_{i} = data[pos:pos + length].decode('utf-8')\n    pos += length\n",
+    "bool": "    value_{i} = data[pos] == 1\n    pos += 1\n",
+    "json": "    value_{i}, pos = decode_json(data, pos)\n",
+}
+
+def _field_source(kind):
+    """Return the decoding code for one field, with a None check for "int?" etc."""
+    if not kind.endswith("?"):
+        return _FIELD_SOURCE[kind]
+    value_source = "".join("    " + line for line in _FIELD_SOURCE[kind[:-1]].splitlines(True))
+    return ("    if data[pos] == 0:\n        value_{i} = None\n        pos += 1\n"
+            "    else:\n        pos += 1\n" + value_source)
+
+def compile_record_decoder(schema):
+    """Generate a decode(data, pos) -> dict function for one schema
+
+    Like compile_row_converter() in section 42, the code is generated once,
+    so decoding a record is straight-line code with no per-field lookups.
+    """
+    lines = ["def decode_record(data, pos):\n"]
+    for i, (_, kind) in enumerate(schema):
+        lines.append(_field_source(kind).replace("{i}", str(i)))
+    fields = ", ".join(f"{name!r}: value_{i}" for i, (name, _) in enumerate(schema))
+    lines.append(f"    return {{{fields}}}\n")
+    namespace = {"decode_varint": decode_varint, "unpack_float": FLOAT64.unpack_from,
+                 "decode_json": _decode_json}
+    exec("".join(lines), namespace)
+    return namespace["decode_record"]
+
+def infer_record_schema(records):
+    """Pick a binary type for every field from the values of all records
+
+    A field that some records do not have is nullable: it is written (and
+    read back) as None for those records.
+    """
+    value_types = {}    # field name -> set of types seen
+    counts = {}         # field name -> number of records that have it
+    num_records = 0
+    for record in records:
+        num_records += 1
+        for name, value in record.items():
+            value_types.setdefault(name, set()).add(type(value))
+            counts[name] = counts.get(name, 0) + 1
+    schema = []
+    for name, types in value_types.items():
+        nullable = type(None) in types or counts[name] < num_records
+        types.discard(type(None))
+        kind = types.pop().__name__ if len(types) == 1 else "json"
+        if kind not in RECORD_ENCODERS:
+            kind = "json"
+        schema.append((name, kind + "?" if nullable and kind != "json" else kind))
+    return schema
+
+def _replacement_mode(filename):
+    """Permissions for a new version of filename: the current ones, if any"""
+    try:
+        return os.stat(filename).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)     # The umask can only be read by setting it
+        os.umask(umask)
+        return 0o666 & ~umask   # What open(filename, "w") would use
+
+class BinaryRecordWriter:
+    """Write flat records in the compact binary format"""
+    def __init__(self, filename, schema, flush_bytes=1 << 20):
+        self.schema = list(schema)
+        self.flush_bytes = flush_bytes
+        self.records_written = 0
+        self._fields = [(name, kind, record_encoder(kind)) for name, kind in self.schema]
+        self._buffer = bytearray()
+        self._record = bytearray()
+        self._file = open(filename, "wb")
+        header = json.dumps([list(field_spec) for field_spec in self.schema]).encode("utf-8")
+        self._file.write(RECORD_MAGIC + struct.pack("<I", len(header)) + header)
+
+    def write(self, record):
+        """Encode one record into the buffer"""
+        body = self._record
+        del body[:]
+        for name, kind, encode in self._fields:
+            try:
+                encode(record.get(name), body)
+            except (TypeError, ValueError, AttributeError, struct.error):
+                raise ValueError(f"Field {name!r}: {record.get(name)!r} "
+                                 f"does not fit type {kind}") from None
+        encode_varint(len(body), self._buffer)
+        self._buffer += body
+        self.records_written += 1
+        if len(self._buffer) >= self.flush_bytes:
+            self.flush()
+
+    def write_many(self, records):
+        """Encode every record of an iterable"""
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        """Write buffered bytes to the file"""
+        self._file.write(self._buffer)
+        del self._buffer[:]
+
+    def close(self):
+        """Flush and close the file"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def write_binary_records(filename, records, schema=None):
+    """Write records (any iterable) to a binary file; return the count
+
+    Without a schema the records are read into a list and scanned once to
+    infer it. The file is written under a temporary name and renamed when
+    complete, so a record that does not fit never leaves a half-written file.
+    """
+    if schema is None:
+        records = list(records)
+        schema = infer_record_schema(records)
+    # A unique temp name, so two writers of the same file never share one
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_filename = tempfile.mkstemp(dir=directory, prefix=os.path.basename(filename) + ".",
+                                         suffix=".tmp")
+    os.close(fd)
+    try:
+        # mkstemp() makes the file private (0600); give it normal permissions
+        os.chmod(temp_filename, _replacement_mode(filename))
+        with BinaryRecordWriter(temp_filename, schema) as writer:
+            writer.write_many(records)
+    except BaseException:
+        os.remove(temp_filename)
+        raise
+    os.replace(temp_filename, filename)
+    return writer.records_written
+
+def iter_binary_records(filename, chunk_size=1 << 20):
+    """Yield records (dicts) from a binary record file, one chunk at a time"""
+    with open(filename, "rb") as binfile:
+        if binfile.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+            raise ValueError(f"{filename} is not a binary record file")
+        (header_length,) = struct.unpack("<I", binfile.read(4))
+        schema = json.loads(binfile.read(header_length))
+        decode_record = compile_record_decoder(schema)
+        data = b""
+        pos = 0
+        while True:
+            chunk = binfile.read(chunk_size)
+            data = data[pos:] + chunk
+            pos = 0
+            end_of_data = len(data)
+            while pos < end_of_data:
+                # Stop when the length prefix or the record is not complete yet
+                if data[pos] >= 0x80 and pos + 10 > end_of_data and chunk:
+                    break
+                length, start = decode_varint(data, pos)
+                if start + length > end_of_data:
+                    if not chunk:
+                        raise ValueError(f"{filename} ends in the middle of a record")
+                    break
+                yield decode_record(data, start)
+                pos = start + length
+            if not chunk:
+                return
+
+# Round trip of the employees from section 10
+write_binary_records("employees.bin", employees)
+print(f"Round trip OK: {list(iter_binary_records('employees.bin')) == employees}")
+print(f"employees.bin: {os.path.getsize('employees.bin')} bytes, "
+      f"JSON: {len(json.dumps(employees, indent=2))} bytes")
+
+# Missing values and mixed types round-trip too
+for sample in ([{"a": 1}, {"a": None}], [{"a": 1}, {"a": 2.5}], [{"s": "x"}, {"s": None}]):
+    write_binary_records("sample.bin", sample)
+    decoded = list(iter_binary_records("sample.bin"))
+    print(f"  {sample} -> schema {infer_record_schema(sample)}, same: {decoded == sample}")
+# Output:
+#   [{'a': 1}, {'a': None}] -> schema [('a', 'int?')], same: True
+#   [{'a': 1}, {'a': 2.5}] -> schema [('a', 'json')], same: True
+#   [{'s': 'x'}, {'s': None}] -> schema [('s', 'str?')], same: True
+
+# Records with different keys: a missing field is stored as None
+write_binary_records("sample.bin", [{"a": 1}, {"b": 2}])
+print(f"Different keys: {list(iter_binary_records('sample.bin'))}")
+# Output: Different keys: [{'a': 1, 'b': None}, {'a': None, 'b': 2}]
+
+# A value that does not fit a given schema leaves the old file unchanged
+try:
+    write_binary_records("sample.bin", [{"s": "y"}, {"s": 5}], schema=[("s", "str")])
+except ValueError as e:
+    print(f"Error: {e}; file still has: {list(iter_binary_records('sample.bin'))}")
+# Output: Error: Field 's': 5 does not fit type str; file still has: [{'s': 'x'}, {'s': None}]
+os.remove("sample.bin")
+
+# Size and speed vs json on the typed employee records (section 52)
+employee_records = employees_index.records
+start = time.perf_counter()
+write_binary_records("employees_large.bin", employee_records)
+binary_encode = time.perf_counter() - start
+start = time.perf_counter()
+decoded_records = list(iter_binary_records("employees_large.bin"))
+binary_decode = time.perf_counter() - start
+start = time.perf_counter()
+with open("employees_large_records.json", "w") as jsonfile:
+    json.dump(employee_records, jsonfile, indent=2)
+json_encode = time.perf_counter() - start
+start = time.perf_counter()
+with open("employees_large_records.json", "r") as jsonfile:
+    json.load(jsonfile)
+json_decode = time.perf_counter() - start
+print(f"{len(employee_records)} records - binary: {os.path.getsize('employees_large.bin') / 1e6:.2f} MB, "
+      f"encode {binary_encode:.3f}s, decode {binary_decode:.3f}s")
+print(f"{len(employee_records)} records - json:   "
+      f"{os.path.getsize('employees_large_records.json') / 1e6:.2f} MB, "
+      f"encode {json_encode:.3f}s, decode {json_decode:.3f}s, "
+      f"same data: {decoded_records == employee_records}")
+os.remove("employees_large.bin")      # employees_large_records.json is used in section 55
+
+print("\n===== 55. Compact Records for Same-Shaped JSON Arrays =====")
+# json.load() turns every object in students_list.json / employees.json into
+# its own dict. (The C decoder already reuses equal key strings within one
+# load, but every record still carries a full hash table.)
+# When all records have the same keys, the keys only need to be stored once:
+# - "tuple" mode: namedtuple records (fields shared by the class)
+# - "slots" mode: instances of a generated class with __slots__
+# Items are decoded one at a time (section 46), so the full list of dicts is
+# never in memory. Records with a different shape stay plain dicts.
+
+from collections import namedtuple
+
+def make_slots_record_class(fields, name="Record"):
+    """Create a small class with __slots__ for the given field names"""
+    def __init__(self, *values):
+        for field_name, value in zip(fields, values):
+            setattr(self, field_name, value)
+
+    def as_dict(self):
+        return {field_name: getattr(self, field_name) for field_name in fields}
+
+    def __repr__(self):
+        values = ", ".join(f"{field_name}={getattr(self, field_name)!r}" for field_name in fields)
+        return f"{name}({values})"
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.as_dict() == other.as_dict()
+
+    return type(name, (), {"__slots__": tuple(fields), "__init__": __init__,
+                           "as_dict": as_dict, "__repr__": __repr__, "__eq__": __eq__})
+
+class CompactRecords:
+    """Records decoded from a JSON array with the keys stored once"""
+    def __init__(self, fields, record_type, records, dict_fallbacks):
+        self.fields = fields
+        self.record_type = record_type
+        self.records = records
+        self.dict_fallbacks = dict_fallbacks    # Records kept as dicts
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def as_dicts(self):
+        """Yield every record as a dict again"""
+        for record in self.records:
+            if isinstance(record, dict):
+                yield record
+            elif hasattr(record, "_asdict"):
+                yield dict(zip(self.fields, record))
+            else:
+                yield record.as_dict()
+
+def load_compact_records(filename, mode="tuple", path="item"):
+    """Decode a JSON array of same-shaped objects into shared-schema records"""
+    if mode not in ("tuple", "slots"):
+        raise ValueError("mode must be 'tuple' or 'slots'")
+    items = iter_json_items(filename, path)
+    records = []
+    fields = None
+    make = None
+    fallbacks = 0
+    for item in items:
+        if type(item) is not dict:
+            records.append(item)
+            fallbacks += 1
+            continue
+        if fields is None:
+            fields = tuple(sys.intern(key) for key in item)
+            if mode == "slots" and all(key.isidentifier() for key in fields):
+                record_type = make_slots_record_class(fields)
+                make = record_type
+            else:
+                # rename=True keeps working when keys are not valid identifiers
+                record_type = namedtuple("Record", fields, rename=True)
+                make = record_type._make
+                mode = "tuple"
+            if mode == "tuple":
+                to_record = make
+            else:
+                def to_record(values, make=make):
+                    return make(*values)
+        keys = item.keys()
+        if len(keys) == len(fields) and all(map(operator.eq, keys, fields)):
+            records.append(to_record(item.values()))
+        elif keys == set(fields):
+            records.append(to_record([item[key] for key in fields]))   # Other key order
+        else:
+            records.append(item)        # Different shape: keep the dict
+            fallbacks += 1
+    return CompactRecords(fields or (), mode if fields else None, records, fallbacks)
+
+students_compact = load_compact_records("students_list.json")
+print(f"Fields stored once: {students_compact.fields}")
+print(f"First record: {students_compact[0]}, name: {students_compact[0].name}")
+slots_students = load_compact_records("students_list.json", mode="slots")
+print(f"Slots record: {slots_students[1]}")
+# Output: Slots record: Record(name='Priya', age=23, grade='B')
+
+# Records with a different shape are kept as dicts
+with open("mixed_shapes.json", "w") as jsonfile:
+    json.dump([{"id": 1, "name": "Rahul"}, {"name": "Priya", "id": 2},
+               {"id": 3, "name": "Ankit", "extra": True}], jsonfile)
+mixed = load_compact_records("mixed_shapes.json")
+print(f"Mixed shapes: {mixed.records}, kept as dicts: {mixed.dict_fallbacks}")
+os.remove("mixed_shapes.json")
+
+# Memory: json.load (list of dicts) vs compact records (section 54's file)
+def load_dict_records(filename):
+    """Load records the usual way"""
+    with open(filename, "r") as jsonfile:
+        return json.load(jsonfile)
+
+def retained_memory(loader, *args):
+    """Return (result, bytes still allocated after loading)"""
+    tracemalloc.start()
+    result = loader(*args)
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, current
+
+dict_records, dict_memory = retained_memory(load_dict_records, "employees_large_records.json")
+tuple_records, tuple_memory = retained_memory(load_compact_records, "employees_large_records.json")
+slots_records, slots_memory = retained_memory(load_compact_records,
+                                              "employees_large_records.json", "slots")
+print(f"{len(dict_records)} records - dicts: {dict_memory / 1e6:.1f} MB, "
+      f"namedtuples: {tuple_memory / 1e6:.1f} MB, slots: {slots_memory / 1e6:.1f} MB")
+print(f"Same data: {list(tuple_records.as_dicts()) == dict_records == list(slots_records.as_dicts())}")
+del dict_records, tuple_records, slots_records
+os.remove("employees_large_records.json")
+
 # ================================
 # End of CSV & JSON Concepts & Examples
 # ================================
@@ -0,0 +1,249 @@
+# ===================================
+# Parallel CSV and JSON Lines Processing - helpers for csv_json_12.py
+# ===================================
+# Worker processes started by multiprocessing on Windows and macOS ("spawn")
+# begin by importing the main script again. csv_json_12.py runs all of its
+# examples (and writes its example files) when it is loaded, so every worker
+# would run the whole tutorial again.
+# This module only defines functions, so importing it has no side effects.
+# The examples run only when this file is executed directly:
+#   python csv_json_parallel.py
+
+import csv
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import time
+
+# Splitting a CSV file into parts for several processes:
+# 1. Split the file into byte ranges that start and end on record boundaries
+# 2. Parse each range in a separate worker process
+# 3. Hand the parsed chunks back to a callback (in order or as they finish)
+#
+# A newline inside a quoted field is not a record boundary. Doubled quotes
+# ("") keep the count even, so a newline is a real boundary only when the
+# number of quote characters before it is even.
+
+def _count_in_range(mm, needle, start, end, block_size=1 << 24):
+    """Count occurrences of needle in mm[start:end], one block at a time"""
+    total = 0
+    for block_start in range(start, end, block_size):
+        total += mm[block_start:min(block_start + block_size, end)].count(needle)
+    return total
+
+def find_record_boundaries(filename, num_parts, quotechar='"'):
+    """Return (header_end, ranges) with byte ranges aligned to CSV records"""
+    size = os.path.getsize(filename)
+    if size == 0:
+        return 0, []
+    quote = quotechar.encode()
+    with open(filename, "rb") as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+
+        def next_boundary(pos, quotes):
+            # quotes = number of quote characters in mm[0:pos]
+            while True:
+                newline = mm.find(b"\n", pos)
+                if newline == -1:
+                    return size, quotes
+                quotes += _count_in_range(mm, quote, pos, newline)
+                pos = newline + 1
+                if quotes % 2 == 0:
+                    return pos, quotes
+
+        header_end, quotes = next_boundary(0, 0)
+        boundaries = [header_end]
+        step = max(1, (size - header_end) // num_parts)
+        pos = header_end
+        for part in range(1, num_parts):
+            target = header_end + part * step
+            if target <= pos:
+                continue
+            quotes += _count_in_range(mm, quote, pos, target)
+            pos, quotes = next_boundary(target, quotes)
+            if pos >= size:
+                break
+            boundaries.append(pos)
+        if boundaries[-1] != size:
+            boundaries.append(size)
+    return header_end, list(zip(boundaries, boundaries[1:]))
+
+def _parse_csv_range(task):
+    """Worker: parse one byte range into chunks of dictionaries"""
+    filename, start, end, fieldnames, chunk_size, process_func, encoding = task
+    with open(filename, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    results = []
+    chunk = []
+    for row in csv.reader(io.StringIO(text, newline="")):
+        if not row:
+            continue    # Skip blank lines, like DictReader does
+        chunk.append(dict(zip(fieldnames, row)))
+        if len(chunk) >= chunk_size:
+            results.append(process_func(chunk) if process_func else chunk)
+            chunk = []
+    if chunk:
+        results.append(process_func(chunk) if process_func else chunk)
+    return results
+
+def parallel_process_csv(filename, callback, process_func=None, workers=None,
+                         chunk_size=1000, ordered=True, encoding="utf-8"):
+    """Parse a CSV file in worker processes and pass each chunk to callback
+
+    process_func (optional, defined in an importable module) runs inside the
+    workers on every chunk, so only its (small) result is sent back instead
+    of the parsed rows. With ordered=False chunks are delivered as soon as a
+    worker finishes. With workers=1 the ranges are parsed in this process.
+    Returns the number of chunks delivered.
+    """
+    workers = workers or os.cpu_count() or 1
+    # A few ranges per worker keeps all cores busy; 64 MB caps a range's size
+    num_parts = max(workers * 4, os.path.getsize(filename) // (64 << 20))
+    header_end, ranges = find_record_boundaries(filename, num_parts)
+    with open(filename, "rb") as f:
+        header_text = f.read(header_end).decode(encoding)
+    fieldnames = next(csv.reader(io.StringIO(header_text, newline="")), [])
+    tasks = [(filename, start, end, fieldnames, chunk_size, process_func, encoding)
+             for start, end in ranges]
+
+    delivered = 0
+    workers = min(workers, len(tasks) or 1)
+    if workers == 1:
+        for results in map(_parse_csv_range, tasks):
+            for item in results:
+                callback(item)
+                delivered += 1
+        return delivered
+    with multiprocessing.Pool(workers) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for results in imap(_parse_csv_range, tasks):
+            for item in results:
+                callback(item)
+                delivered += 1
+    return delivered
+
+# Worker-side function: defined in this module so it can be pickled
+def salary_totals(chunk):
+    """Return (row count, total salary) for a chunk of employee rows"""
+    return len(chunk), sum(int(row["Salary"]) for row in chunk)
+
+# JSON Lines is simpler: every newline is a record boundary, so a range
+# only has to be moved forward to the end of the line it starts in.
+
+def _jsonl_ranges(filename, num_parts):
+    """Split a JSON Lines file into byte ranges that end at newlines"""
+    size = os.path.getsize(filename)
+    ranges = []
+    with open(filename, "rb") as jsonlfile:
+        start = 0
+        for part in range(1, num_parts + 1):
+            if start >= size:
+                break
+            jsonlfile.seek(max(start, size * part // num_parts))
+            jsonlfile.readline()        # Move to the end of the current line
+            end = min(jsonlfile.tell(), size) if part < num_parts else size
+            if end > start:
+                ranges.append((start, end))
+                start = end
+    return ranges
+
+def _read_jsonl_range(task):
+    """Worker: decode the records of one byte range"""
+    filename, start, end, process_func = task
+    with open(filename, "rb") as jsonlfile:
+        jsonlfile.seek(start)
+        lines = jsonlfile.read(end - start).splitlines()
+    records = [json.loads(line) for line in lines if line.strip()]
+    return process_func(records) if process_func else records
+
+def parallel_read_jsonl(filename, process_func=None, workers=None):
+    """Decode a JSON Lines file in worker processes; returns one result per range
+
+    process_func (module-level function) runs in the worker on each range's
+    list of records; without it the records themselves are returned.
+    With workers=1 the ranges are read in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    num_parts = max(workers * 4, os.path.getsize(filename) // (64 << 20))
+    tasks = [(filename, start, end, process_func)
+             for start, end in _jsonl_ranges(filename, num_parts)]
+    if not tasks:
+        return []
+    workers = min(workers, len(tasks))
+    if workers == 1:
+        return list(map(_read_jsonl_range, tasks))
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(_read_jsonl_range, tasks)
+
+def count_by_department(records):
+    """Worker-side function: count records per department"""
+    counts = {}
+    for record in records:
+        counts[record["Department"]] = counts.get(record["Department"], 0) + 1
+    return counts
+
+
+# The examples only run when this file is executed, never in the workers
+if __name__ == "__main__":
+    print("===== Parallel CSV Processing =====")
+    example_file = "parallel_employees.csv"
+    with open(example_file, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["EmployeeID", "Name", "Note", "Salary"])
+        for emp_id in range(1, 200001):
+            # Every 50th note has a quoted newline inside it
+            note = "line one\nline two" if emp_id % 50 == 0 else "single line"
+            writer.writerow([emp_id, f"Employee{emp_id}", note, 30000 + emp_id % 1000 * 100])
+
+    # Single process: csv.DictReader in chunks of 1000 rows
+    start = time.perf_counter()
+    sequential = []
+    with open(example_file, "r", newline="") as csvfile:
+        chunk = []
+        for row in csv.DictReader(csvfile):
+            chunk.append(row)
+            if len(chunk) >= 1000:
+                sequential.append(salary_totals(chunk))
+                chunk = []
+        if chunk:
+            sequential.append(salary_totals(chunk))
+    sequential_time = time.perf_counter() - start
+
+    parallel = []
+    start = time.perf_counter()
+    parallel_process_csv(example_file, parallel.append,
+                         process_func=salary_totals, ordered=False)
+    parallel_time = time.perf_counter() - start
+
+    total_rows = sum(count for count, _ in parallel)
+    same = sum(t for _, t in parallel) == sum(t for _, t in sequential)
+    print(f"Sequential: {sequential_time:.3f}s, parallel: {parallel_time:.3f}s "
+          f"({os.cpu_count()} cores, {total_rows} rows, same totals: {same})")
+    os.remove(example_file)
+
+    print("===== Parallel JSON Lines Reading =====")
+    example_file = "parallel_employees.jsonl"
+    departments = ["HR", "IT", "Finance", "Sales"]
+    with open(example_file, "w") as jsonlfile:
+        for emp_id in range(1, 200001):
+            record = {"EmployeeID": emp_id, "Name": f"Employee{emp_id}",
+                      "Department": departments[emp_id % 4]}
+            jsonlfile.write(json.dumps(record) + "\n")
+
+    start = time.perf_counter()
+    with open(example_file, "rb") as jsonlfile:
+        sequential_counts = count_by_department(json.loads(line) for line in jsonlfile)
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    department_counts = {}
+    for counts in parallel_read_jsonl(example_file, count_by_department):
+        for dept, count in counts.items():
+            department_counts[dept] = department_counts.get(dept, 0) + count
+    parallel_time = time.perf_counter() - start
+    print(f"Sequential: {sequential_time:.3f}s, parallel: {parallel_time:.3f}s, "
+          f"same counts: {department_counts == sequential_counts}")
+    os.remove(example_file)
@@ -846,6 +846,740 @@ if os.path.exists("read_example.txt"):
     content = read_file_content("read_example.txt")
     print(f"File content length: {len(content)} characters")
 
+print("\n===== 26. Zero-Copy Binary Chunk Reading =====")
+# read_in_chunks() (section 13) decodes text and creates a new string for
+# every 1 KB chunk. For big binary files it is faster to:
+# - open the file unbuffered in binary mode ("rb", buffering=0)
+# - readinto() a bytearray that is allocated once and reused
+# - yield memoryview slices, which point into the buffer without copying
+# A small ring of buffers lets the consumer keep the last few chunks:
+# chunk k is only overwritten when chunk k + num_buffers is read.
+
+import os
+import time
+import hashlib
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1 MB: large sequential reads suit most disks
+
+def read_binary_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, num_buffers=2):
+    """Read a file in binary chunks, yielding memoryviews into reused buffers"""
+    views = [memoryview(bytearray(chunk_size)) for _ in range(num_buffers)]
+    with open(file_path, "rb", buffering=0) as file:
+        if hasattr(os, "posix_fadvise"):
+            # Tell the OS we read front to back so it reads ahead more
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        index = 0
+        while True:
+            view = views[index]
+            bytes_read = file.readinto(view)
+            if not bytes_read:
+                break
+            yield view[:bytes_read]
+            index = (index + 1) % num_buffers
+
+# Usage: a memoryview can be passed straight to hashlib, file.write(), etc.
+digest = hashlib.sha256()
+for chunk in read_binary_chunks("read_example.txt", chunk_size=16):
+    digest.update(chunk)
+print(f"SHA-256 of read_example.txt: {digest.hexdigest()[:16]}...")
+
+# Keep a chunk longer than the ring allows? Copy it with bytes(chunk)
+previous = None
+for chunk in read_binary_chunks("read_example.txt", chunk_size=16):
+    previous = chunk  # Still valid: the ring has 2 buffers
+print(f"Last chunk: {bytes(previous)!r}")
+
+# Benchmark: read_in_chunks (text, 1 KB) vs read_binary_chunks (1 MB)
+big_file = "large_binary_example.bin"
+with open(big_file, "wb") as file:
+    block = (b"0123456789abcdef" * 64 + b"\n") * 1024  # About 1 MB per block
+    for _ in range(16):
+        file.write(block)
+
+def time_reader(reader, *args, **kwargs):
+    """Consume a chunk generator and return (bytes or chars seen, seconds)"""
+    start = time.perf_counter()
+    total = 0
+    for chunk in reader(*args, **kwargs):
+        total += len(chunk)
+    return total, time.perf_counter() - start
+
+text_total, text_time = time_reader(read_in_chunks, big_file)
+binary_total, binary_time = time_reader(read_binary_chunks, big_file)
+size_mb = os.path.getsize(big_file) / 1e6
+print(f"read_in_chunks:     {text_total} chars in {text_time:.3f}s "
+      f"({size_mb / text_time:.0f} MB/s)")
+print(f"read_binary_chunks: {binary_total} bytes in {binary_time:.3f}s "
+      f"({size_mb / binary_time:.0f} MB/s)")
+
+# Memory: only the ring buffers are allocated, however big the file is
+import tracemalloc
+tracemalloc.start()
+time_reader(read_binary_chunks, big_file)
+peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+print(f"Peak memory while streaming {size_mb:.0f} MB: {peak / 1e6:.1f} MB")
+os.remove(big_file)
+
+print("\n===== 27. Parallel Line and Word Counting (wc) =====")
+# Sections 13 and 21 count lines and words by decoding the file and looping
+# over text lines in one process. A wc-style counter can work on raw bytes:
+# - mmap the file so each worker reads its part without extra copies
+# - split it into ranges that end right after a newline (or, in a file
+#   without newlines, after a space or tab), so no word is cut in two
+# - count each range in a process pool and add the results up
+# Lines end at "\n", "\r\n" or a lone "\r", as in a text-mode loop. bytes.split()
+# only splits on ASCII whitespace, so a block with other bytes that
+# str.split() treats as spaces (U+00A0, U+2003, "\x1c", ...) is decoded first.
+#
+# On Windows and macOS every worker process starts by importing the main
+# script again, and this file runs all of its examples when it is loaded.
+# So the counting code lives in file_io_parallel.py, which has no side
+# effects on import. Run that file to see the multi-process benchmark;
+# here workers=1 counts the ranges in this process.
+
+from file_io_parallel import count_file
+
+# Count the same way as sections 13 and 21
+def count_lines_and_words(file_path):
+    """Single-process text count used by sections 13 and 21"""
+    line_count = word_count = 0
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line_count += 1
+            word_count += len(line.split())
+    return line_count, word_count
+
+print(f"read_example.txt: {count_file('read_example.txt', workers=1)}")
+
+# A file without any newline is split at spaces instead
+with open("one_line_example.txt", "w") as file:
+    file.write(" ".join(f"word{i}" for i in range(1000)))
+counts = count_file("one_line_example.txt", workers=1, chunk_size=1024)
+print(f"One long line: {counts}, same as text loop: "
+      f"{(counts['lines'], counts['words']) == count_lines_and_words('one_line_example.txt')}")
+# Output: One long line: {'lines': 1, 'words': 1000, 'bytes': 7889}, same as text loop: True
+os.remove("one_line_example.txt")
+
+# Old Mac line endings and non-ASCII spaces are counted like the text loop
+with open("mixed_text_example.txt", "w", encoding="utf-8", newline="") as file:
+    file.write("caf\u00e9\u00a0au lait\rline\u2003two\r\nthree\n")
+counts = count_file("mixed_text_example.txt", workers=1)
+print(f"Mixed text: {counts}, same as text loop: "
+      f"{(counts['lines'], counts['words']) == count_lines_and_words('mixed_text_example.txt')}")
+# Output: Mixed text: {'lines': 3, 'words': 6, 'bytes': 33}, same as text loop: True
+os.remove("mixed_text_example.txt")
+
+print("\n===== 28. Searching Many Files (grep) =====")
+# Section 22 runs re.findall() on every line of one file. To search a whole
+# directory tree quickly:
+# - mmap each file and search the raw bytes (no decoding, no line loop)
+# - pull a literal that every match must contain out of the pattern
+#   (e.g. b"Line " from r"Line \d+") and jump between its occurrences with
+#   find(); the regex only runs on lines that contain it
+# - count line numbers only when a line matches
+# - search files in a thread pool and yield matches as files finish
+# Note: matches are found per line, like section 22 ("^" and "$" match at
+# line starts and ends).
+
+import mmap
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# The regex parser is an internal CPython module (re._parser, called
+# sre_parse before 3.11), not a public API: it may change between versions.
+# Sections 28 and 29 only use parse(), the LITERAL/SUBPATTERN/REPEAT opcodes
+# and getwidth().
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+GrepMatch = namedtuple("GrepMatch", ["path", "line_number", "line", "matches"])
+
+def _literal_runs(parsed):
+    """Yield runs of literal bytes that must appear in every match"""
+    run = bytearray()
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(value)
+            continue
+        if run:
+            yield bytes(run)
+            run = bytearray()
+        if op is sre_parse.SUBPATTERN:
+            group, add_flags, del_flags, subpattern = value
+            if not add_flags & re.IGNORECASE:
+                yield from _literal_runs(subpattern)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and value[0] >= 1:
+            yield from _literal_runs(value[2])
+    if run:
+        yield bytes(run)
+
+def required_literal(pattern, flags=0):
+    """Return the longest literal every match must contain, or None"""
+    if isinstance(pattern, str):
+        pattern = pattern.encode("utf-8")
+    if flags & re.IGNORECASE:
+        return None
+    parsed = sre_parse.parse(pattern, flags)
+    if parsed.state.flags & re.IGNORECASE:
+        return None  # Pattern starts with (?i)
+    return max(_literal_runs(parsed), key=len, default=None)
+
+def _decode_match(match):
+    """Decode a findall() result (bytes or tuple of bytes)"""
+    if isinstance(match, tuple):
+        return tuple(part.decode("utf-8", "replace") for part in match)
+    return match.decode("utf-8", "replace")
+
+def grep_file(path, regex, literal=None):
+    """Return a list of GrepMatch for one file (binary files are skipped)
+
+    A file that cannot be read raises OSError.
+    """
+    results = []
+    with open(path, "rb") as file:
+        if b"\0" in file.read(8192):
+            return results  # Looks binary, like grep's default
+        if os.fstat(file.fileno()).st_size == 0:
+            return results
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            line_number = 1
+            counted_to = 0
+            position = 0
+            size = len(mm)
+            while position < size:
+                if literal:
+                    hit = mm.find(literal, position)
+                    if hit == -1:
+                        break
+                    line_start = mm.rfind(b"\n", 0, hit) + 1
+                else:
+                    match = regex.search(mm, position)
+                    if match is None:
+                        break
+                    line_start = mm.rfind(b"\n", 0, match.start()) + 1
+                line_end = mm.find(b"\n", line_start)
+                if line_end == -1:
+                    line_end = size
+                text_end = line_end
+                if text_end > line_start and mm[text_end - 1] == 13:
+                    text_end -= 1  # Leave out the "\r" of "\r\n" line endings
+                matches = regex.findall(mm, line_start, text_end)
+                if matches:
+                    line_number += mm[counted_to:line_start].count(b"\n")
+                    counted_to = line_start
+                    line = mm[line_start:text_end].decode("utf-8", "replace")
+                    results.append(GrepMatch(path, line_number, line,
+                                             [_decode_match(m) for m in matches]))
+                position = line_end + 1
+    return results
+
+def iter_files(root):
+    """Yield the path of every file under a directory"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            yield os.path.join(dirpath, filename)
+
+def grep_tree(pattern, root, flags=0, workers=8, onerror=None):
+    """Search every file under root, yielding GrepMatch results as they are found
+
+    Like os.walk(), files that cannot be read are reported to
+    onerror(path, error) when it is given; otherwise the OSError is raised.
+    """
+    if isinstance(pattern, str):
+        pattern = pattern.encode("utf-8")
+    regex = re.compile(pattern, flags | re.MULTILINE)
+    literal = required_literal(pattern, flags)
+    paths = iter_files(root)
+
+    def file_results(future, path):
+        try:
+            return future.result()
+        except OSError as e:
+            if onerror is None:
+                raise
+            onerror(path, e)
+            return []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}    # future -> path
+        for path in paths:
+            pending[executor.submit(grep_file, path, regex, literal)] = path
+            if len(pending) >= workers * 4:  # Keep the queue short for huge trees
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from file_results(future, pending.pop(future))
+        for future, path in pending.items():
+            yield from file_results(future, path)
+
+for example in [r"Line \d+", r"(GET|POST) /api/v\d+/users", r"(?i)error"]:
+    print(f"Required literal of {example!r}: {required_literal(example)}")
+# Output: Required literal of r'(?i)error': None
+
+# Build a tree of log files and compare with section 22's loop per file
+search_root = "grep_example_logs"
+for folder in range(20):
+    os.makedirs(os.path.join(search_root, f"service_{folder}"), exist_ok=True)
+    for number in range(100):
+        with open(os.path.join(search_root, f"service_{folder}", f"log_{number}.txt"), "w") as file:
+            for i in range(200):
+                level = "ERROR code=" + str(i) if (folder + number + i) % 97 == 0 else "INFO ok"
+                file.write(f"2024-01-01 12:00:{i % 60:02d} {level} request {i}\n")
+
+pattern = r"ERROR code=(\d+)"
+
+def grep_with_line_loop(pattern, root):
+    """Section 22's line-by-line findall, run once per file"""
+    results = []
+    for path in iter_files(root):
+        with open(path, "r") as file:
+            for line_num, line in enumerate(file, 1):
+                matches = re.findall(pattern, line)
+                if matches:
+                    results.append((path, line_num, matches))
+    return results
+
+start = time.perf_counter()
+loop_results = grep_with_line_loop(pattern, search_root)
+loop_time = time.perf_counter() - start
+
+start = time.perf_counter()
+tree_results = list(grep_tree(pattern, search_root))
+tree_time = time.perf_counter() - start
+
+print(f"Line loop: {len(loop_results)} matches in {loop_time:.3f}s")
+print(f"grep_tree: {len(tree_results)} matches in {tree_time:.3f}s")
+print(f"Same matches: {sorted(loop_results) == sorted((m.path, m.line_number, m.matches) for m in tree_results)}")
+for match in grep_tree(pattern, os.path.join(search_root, "service_0")):
+    print(f"{match.path}:{match.line_number}: {match.line}")
+    break
+
+# Unreadable files (here a link to a deleted file) go to onerror
+os.symlink("missing.txt", os.path.join(search_root, "broken_link.txt"))
+def report_error(path, error):
+    print(f"Skipping {path}: {error.strerror}")
+skipped_results = list(grep_tree(pattern, search_root, onerror=report_error))
+# Output: Skipping grep_example_logs/broken_link.txt: No such file or directory
+shutil.rmtree(search_root)
+
+print("\n===== 29. Streaming Search and Replace =====")
+# Section 22 replaces text with file.read() + re.sub() on the whole file,
+# which needs the file (twice) in memory. A streaming replace instead:
+# - reads the file in chunks and replaces matches chunk by chunk
+# - holds back the last `window` characters of each chunk, so a match that
+#   crosses a chunk boundary is completed with the next chunk
+# - keeps some already-written text before the current position so lookbehind
+#   and \b still see the characters in front of them
+# - writes to a temp file in the same directory, then os.replace()s the
+#   original (readers see either the old or the new file, never half of it)
+# Memory stays around chunk_size + 2 * window, whatever the file size.
+# The window must be longer than any match: for patterns without a maximum
+# length (e.g. \d+) a generous default is used.
+
+import re
+import shutil
+import tempfile
+
+UNBOUNDED_MATCH_WINDOW = 64 * 1024  # Characters
+
+def match_window(regex):
+    """Return how many characters to hold back between chunks for a pattern"""
+    # sre_parse is the internal regex parser imported in section 28
+    min_width, max_width = sre_parse.parse(regex.pattern, regex.flags).getwidth()
+    if max_width >= sre_parse.MAXREPEAT:
+        return UNBOUNDED_MATCH_WINDOW
+    return max(2 * max_width, 4096)
+
+TEMPLATE_REFERENCE = re.compile(r"\\(?:g<(\w+)>|([1-9][0-9]?)|.)", re.DOTALL)
+
+def compile_replacement(regex, repl):
+    """Turn a replacement template like r"Line Number \\1" into a function of the match"""
+    if callable(repl):
+        return repl
+    literals = []
+    groups = []
+    last = 0
+    for reference in TEMPLATE_REFERENCE.finditer(repl):
+        name = reference.group(1) or reference.group(2)
+        if name is None:
+            # Other escapes (\n, \\, ...): let match.expand() handle them
+            return lambda match: match.expand(repl)
+        group = int(name) if name.isdigit() else name
+        if group not in regex.groupindex and not (isinstance(group, int) and group <= regex.groups):
+            raise re.error(f"invalid group reference {name}")
+        literals.append(repl[last:reference.start()])
+        groups.append(group)
+        last = reference.end()
+    tail = repl[last:]
+    if not groups:
+        return lambda match: tail
+
+    def expand(match):
+        parts = []
+        for literal, group in zip(literals, groups):
+            parts.append(literal)
+            parts.append(match.group(group) or "")  # Unmatched groups become ""
+        parts.append(tail)
+        return "".join(parts)
+    return expand
+
+def stream_replace(file_path, pattern, repl, chunk_size=1024 * 1024, window=None,
+                   flags=0, encoding="utf-8"):
+    """Replace pattern matches in a file without loading it; returns the count"""
+    regex = re.compile(pattern, flags)
+    if window is None:
+        window = match_window(regex)
+    # match.expand() parses the template on every call, so parse it once here
+    expand = compile_replacement(regex, repl)
+    replacements = 0
+    directory = os.path.dirname(os.path.abspath(file_path))
+    temp_file = tempfile.NamedTemporaryFile("w", encoding=encoding, newline="",
+                                            dir=directory, delete=False,
+                                            prefix=os.path.basename(file_path) + ".",
+                                            suffix=".tmp")
+    try:
+        with open(file_path, "r", encoding=encoding, newline="") as source, temp_file:
+            buffer = ""
+            position = 0  # buffer[:position] is already written (kept as context)
+            while True:
+                chunk = source.read(chunk_size)
+                at_end = not chunk
+                buffer += chunk
+                limit = len(buffer) if at_end else len(buffer) - window
+                if limit <= position and not at_end:
+                    continue  # Not enough new text yet
+                parts = []
+                written_to = position
+                cut = limit
+                for match in regex.finditer(buffer, position):
+                    if not at_end and (match.start() >= limit or match.end() >= limit):
+                        cut = min(match.start(), limit)  # Finish it with the next chunk
+                        break
+                    parts.append(buffer[written_to:match.start()])
+                    parts.append(expand(match))
+                    written_to = match.end()
+                    replacements += 1
+                cut = max(cut, written_to)
+                parts.append(buffer[written_to:cut])
+                temp_file.write("".join(parts))
+                if at_end:
+                    break
+                keep_from = max(0, cut - window)
+                buffer = buffer[keep_from:]
+                position = cut - keep_from
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        shutil.copymode(file_path, temp_file.name)
+        os.replace(temp_file.name, file_path)
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+    return replacements
+
+# Same replacement as section 22, without reading the whole file
+shutil.copy("read_example.txt", "stream_modified_example.txt")
+count = stream_replace("stream_modified_example.txt", r"Line (\d+)", r"Line Number \1")
+with open("stream_modified_example.txt", "r") as file:
+    print(f"Replaced {count} matches, first line: {file.readline().strip()}")
+
+# A 1-character chunk size still finds matches that cross chunk boundaries
+shutil.copy("read_example.txt", "tiny_chunks_example.txt")
+stream_replace("tiny_chunks_example.txt", r"Line (\d+)", r"Line Number \1", chunk_size=1)
+with open("tiny_chunks_example.txt", "r") as a, open("stream_modified_example.txt", "r") as b:
+    print(f"Same result with 1-char chunks: {a.read() == b.read()}")
+
+# Memory: whole-file re.sub vs stream_replace on a larger file
+import tracemalloc
+
+big_text_file = "large_replace_example.txt"
+with open(big_text_file, "w") as file:
+    for i in range(300000):
+        file.write(f"Line {i}: some text for the replace example\n")
+
+def replace_whole_file(file_path, pattern, repl):
+    """Section 22's approach: read everything, re.sub, write back"""
+    with open(file_path, "r") as file:
+        content = file.read()
+    modified_content = re.sub(pattern, repl, content)
+    with open(file_path, "w") as file:
+        file.write(modified_content)
+
+for name, func in [("read() + re.sub", replace_whole_file), ("stream_replace", stream_replace)]:
+    start = time.perf_counter()
+    func(big_text_file, r"Line (\d+)", r"Entry \1")
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()  # Measured separately: tracing slows the run down
+    func(big_text_file, r"Entry (\d+)", r"Line \1")  # Undo for the next run
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name}: {elapsed:.3f}s, peak memory {peak / 1e6:.1f} MB "
+          f"(file {os.path.getsize(big_text_file) / 1e6:.1f} MB)")
+os.remove(big_text_file)
+
+print("\n===== 30. Durable Atomic Writes and Group Commit =====")
+# safe_write() (section 25) is not safe after a crash or with several writers:
+# - every writer uses the same "file.tmp" name, so two writers can mix data
+# - without fsync, a crash after the rename can leave an empty or partial file
+#   (the rename may reach the disk before the data does)
+# A durable atomic write:
+# 1. writes to a unique temp file in the same directory (os.replace only
+#    works atomically within one filesystem)
+# 2. fsyncs the temp file, so the data is on disk
+# 3. os.replace()s it over the target
+# 4. fsyncs the directory, so the rename itself is on disk
+# fsync is slow (a disk flush each time), and atomic_write() needs two per
+# write: the file and its directory. When many small files are written, a
+# group commit handles the writes queued within a few milliseconds together:
+# - every file still gets its own fsync (Python has no way to flush just a
+#   set of files at once; os.sync() flushes the whole system), but the
+#   fsyncs run in parallel threads so the disk flushes can overlap
+# - only the directory fsync is shared: one per directory per batch
+# - repeated writes to the same file in a batch are written once
+# `syncs` in stats() counts the real fsync calls (files + directories).
+# mkstemp() creates the temp file with mode 0600, so the replacement gets the
+# old file's permissions (or the umask default for a new file) before the
+# rename, the same as writing the file directly.
+
+import os
+import queue
+import stat
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+_umask = None
+_umask_lock = threading.Lock()
+
+def _current_umask():
+    """Return the process umask (read on first use, then cached)"""
+    global _umask
+    # os.umask() can only be read by setting it; the lock keeps two threads
+    # from reading the temporary 0 of each other
+    with _umask_lock:
+        if _umask is None:
+            _umask = os.umask(0)
+            os.umask(_umask)
+    return _umask
+
+def fsync_directory(directory):
+    """Flush a directory entry (e.g. a rename) to disk; return False if not possible"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return False  # Windows: directories cannot be opened for fsync
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return True
+
+def _new_file_mode(filepath):
+    """Return the permissions for a file replacing filepath"""
+    try:
+        return stat.S_IMODE(os.stat(filepath).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_current_umask()  # What open(filepath, "w") would create
+
+def _write_temp_file(filepath, content, encoding="utf-8", durable=False):
+    """Write content to a new uniquely named temp file next to filepath"""
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, temp_path = tempfile.mkstemp(dir=directory,
+                                     prefix="." + os.path.basename(filepath) + ".",
+                                     suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            os.chmod(temp_path, _new_file_mode(filepath))
+            file.write(content.encode(encoding) if isinstance(content, str) else content)
+            file.flush()
+            if durable:
+                os.fsync(file.fileno())
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path
+
+def atomic_write(filepath, content, encoding="utf-8", durable=True):
+    """Atomically replace filepath with content (str or bytes)"""
+    temp_path = _write_temp_file(filepath, content, encoding, durable)
+    try:
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    if durable:
+        fsync_directory(os.path.dirname(os.path.abspath(filepath)))
+
+class GroupCommitWriter:
+    """Durable atomic writes that share directory fsyncs between writes queued together"""
+    def __init__(self, max_delay=0.001, max_batch=512, encoding="utf-8",
+                 sync_threads=8, latency_samples=10000):
+        self.max_delay = max_delay      # Seconds to wait for more writes
+        self.max_batch = max_batch
+        self.encoding = encoding
+        self.queue = queue.Queue()
+        self.writes = 0
+        self.batches = 0
+        self.syncs = 0                  # fsync calls (files and directories)
+        self.latencies = deque(maxlen=latency_samples)  # Only the most recent writes
+        self.started = time.perf_counter()
+        self._sync_pool = ThreadPoolExecutor(max_workers=sync_threads)
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, filepath, content, wait=True):
+        """Queue an atomic write; wait until it is on disk (or return a Future)"""
+        future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise ValueError("write to a closed GroupCommitWriter")
+            self.queue.put((filepath, content, future, time.perf_counter()))
+        if wait:
+            future.result()
+        return future
+
+    def _next_batch(self):
+        """Collect the writes that arrive within max_delay of the first one"""
+        request = self.queue.get()
+        if request is None:
+            return None
+        batch = [request]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self.queue.put(None)  # Finish this batch, then stop
+                break
+            batch.append(request)
+        return batch
+
+    def _commit(self, batch):
+        """Write, sync and rename one batch of writes"""
+        latest = {}
+        for filepath, content, future, queued in batch:
+            latest[os.path.abspath(filepath)] = content  # Only the last write to a file counts
+        futures = []
+        try:
+            # One fsync per file, run in threads so they overlap
+            futures = [self._sync_pool.submit(_write_temp_file, filepath, content,
+                                              self.encoding, True)
+                       for filepath, content in latest.items()]
+            temp_files = [future.result() for future in futures]
+            self.syncs += len(temp_files)
+            for filepath, temp_path in zip(latest, temp_files):
+                os.replace(temp_path, filepath)
+            # One fsync per directory for the whole batch
+            for directory in {os.path.dirname(filepath) for filepath in latest}:
+                if fsync_directory(directory):
+                    self.syncs += 1
+        except BaseException as e:
+            # Remove temp files that were not renamed, then report the error
+            # to every writer in the batch
+            for future in futures:
+                if future.exception() is None and os.path.exists(future.result()):
+                    os.unlink(future.result())
+            for filepath, content, future, queued in batch:
+                future.set_exception(e)
+            return
+        done = time.perf_counter()
+        for filepath, content, future, queued in batch:
+            self.latencies.append(done - queued)
+            future.set_result(None)
+        self.writes += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            self._commit(batch)
+
+    def stats(self):
+        """Return write counts, latency percentiles (ms, recent writes) and throughput"""
+        latencies = sorted(self.latencies)
+        elapsed = time.perf_counter() - self.started
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+        return {"writes": self.writes, "batches": self.batches, "syncs": self.syncs,
+                "writes_per_batch": self.writes / self.batches if self.batches else 0.0,
+                "syncs_per_write": self.syncs / self.writes if self.writes else 0.0,
+                "p50_ms": percentile(0.50), "p99_ms": percentile(0.99),
+                "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+                "writes_per_sec": self.writes / elapsed if elapsed else 0.0}
+
+    def close(self):
+        """Finish queued writes and stop the commit thread"""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.queue.put(None)
+        self.thread.join()
+        self._sync_pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Usage: same call as safe_write(), but crash-safe
+atomic_write("atomic_example.txt", "state: ready\n")
+with open("atomic_example.txt", "r") as file:
+    print(f"Atomic write: {file.read().strip()}")
+
+# Benchmark: many threads writing small state files
+state_dir = "state_files"
+os.makedirs(state_dir, exist_ok=True)
+num_threads = 32
+writes_per_thread = 25
+
+def run_writers(write_func):
+    """Write small state files from several threads; return writes per second"""
+    def writer(thread_id):
+        for i in range(writes_per_thread):
+            write_func(os.path.join(state_dir, f"worker_{thread_id}_{i % 10}.json"),
+                       f'{{"worker": {thread_id}, "step": {i}}}\n')
+    threads = [threading.Thread(target=writer, args=(t,)) for t in range(num_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return num_threads * writes_per_thread / (time.perf_counter() - start)
+
+print(f"safe_write (not durable): {run_writers(safe_write):.0f} writes/s")
+print(f"atomic_write (fsync each): {run_writers(atomic_write):.0f} writes/s")
+with GroupCommitWriter() as group_writer:
+    rate = run_writers(group_writer.write)
+    stats = group_writer.stats()
+print(f"GroupCommitWriter: {rate:.0f} writes/s, {stats['writes']} writes in "
+      f"{stats['batches']} batches ({stats['writes_per_batch']:.1f} per batch), "
+      f"{stats['syncs_per_write']:.2f} fsyncs per write (atomic_write: 2), "
+      f"latency p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+try:
+    group_writer.write(os.path.join(state_dir, "late.json"), "{}\n")
+except ValueError as e:
+    print(f"Write after close: {e}")
+# Output: Write after close: write to a closed GroupCommitWriter
+with open(os.path.join(state_dir, "worker_0_9.json"), "r") as file:
+    print(f"Last state of worker 0: {file.read().strip()}")
+shutil.rmtree(state_dir)
+
 # ================================
 # End of File I/O Concepts & Examples
 # ================================
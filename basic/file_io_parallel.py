@@ -0,0 +1,132 @@
+# ===================================
+# Parallel Line and Word Counting - helpers for file_io_11.py
+# ===================================
+# Worker processes started by multiprocessing on Windows and macOS ("spawn")
+# begin by importing the main script again. file_io_11.py runs all of its
+# examples (and creates its example files) when it is loaded, so every
+# worker would run the whole tutorial again.
+# This module only defines functions, so importing it has no side effects.
+# The benchmark runs only when this file is executed directly:
+#   python file_io_parallel.py
+
+import mmap
+import multiprocessing
+import os
+import re
+import time
+
+# Counting like `wc` on raw bytes:
+# 1. mmap the file so each worker reads its part without extra copies
+# 2. split it into ranges that end right after a whitespace byte, so no word
+#    is cut in two (a newline is preferred; a file without newlines is split
+#    at spaces or tabs instead)
+# 3. count each range in a process pool and add the results up
+# The counts match a text loop (`for line in open(path)` + line.split()):
+# - lines end at "\n", "\r\n" or a lone "\r" (universal newlines)
+# - bytes.split() only knows ASCII whitespace, while str.split() also splits
+#   on "\x1c"-"\x1f" and non-ASCII spaces (U+00A0, U+2003, U+2028, ...), so a
+#   block with such bytes is decoded and counted with str.split()
+
+COUNT_BLOCK_SIZE = 4 * 1024 * 1024  # Bytes counted at a time inside a worker
+ASCII_WHITESPACE = re.compile(rb"[ \t\n\r\x0b\x0c]")  # What bytes.split() splits on
+NEEDS_DECODING = re.compile(rb"[\x1c-\x1f\x80-\xff]")  # Bytes that bytes.split() misreads
+
+def next_boundary(mm, offset, window=COUNT_BLOCK_SIZE):
+    """Return the offset just after the next newline (or other whitespace)
+
+    A newline within the next `window` bytes is preferred; without one the
+    first ASCII whitespace byte is used, so a file with no newlines is still
+    split into ranges.
+    """
+    size = len(mm)
+    while offset < size:
+        window_end = min(offset + window, size)
+        position = mm.find(b"\n", offset, window_end)
+        if position == -1:
+            match = ASCII_WHITESPACE.search(mm, offset, window_end)
+            if match is not None:
+                position = match.start()
+                if mm[position:position + 2] == b"\r\n":
+                    position += 1   # Keep "\r\n" together: it is one line end
+                return position + 1
+        else:
+            return position + 1
+        offset = window_end
+    return size
+
+def _count_range(task):
+    """Count (lines, words) in one whitespace-aligned byte range of a file"""
+    file_path, start, end, encoding = task
+    lines = words = 0
+    with open(file_path, "rb") as file, \
+         mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        while start < end:
+            block_end = min(next_boundary(mm, start + COUNT_BLOCK_SIZE), end)
+            block = mm[start:block_end]
+            lines += block.count(b"\n") + block.count(b"\r") - block.count(b"\r\n")
+            if NEEDS_DECODING.search(block):
+                words += len(block.decode(encoding).split())
+            else:
+                words += len(block.split())
+            start = block_end
+    return lines, words
+
+def count_file(file_path, workers=None, chunk_size=64 * 1024 * 1024, encoding="utf-8"):
+    """Count lines, words and bytes of a file like `wc`, using a process pool
+
+    The counts are the ones a text loop over open(file_path, encoding=encoding)
+    gives; the encoding must be ASCII-compatible (UTF-8, Latin-1, cp1252, ...).
+    With workers=1 the ranges are counted in this process.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return {"lines": 0, "words": 0, "bytes": 0}
+    with open(file_path, "rb") as file, \
+         mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        boundaries = [0]
+        while boundaries[-1] < size:
+            boundaries.append(next_boundary(mm, boundaries[-1] + chunk_size))
+        ends_with_newline = mm[size - 1:size] in (b"\n", b"\r")
+    tasks = [(file_path, start, end, encoding) for start, end in zip(boundaries, boundaries[1:])]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers == 1:
+        results = map(_count_range, tasks)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(_count_range, tasks)
+    lines = words = 0
+    for range_lines, range_words in results:
+        lines += range_lines
+        words += range_words
+    if not ends_with_newline:
+        lines += 1  # `for line in file` also counts a last line without a line break
+    return {"lines": lines, "words": words, "bytes": size}
+
+# The benchmark only runs when this file is executed, never in the workers
+if __name__ == "__main__":
+    print("===== Parallel Line and Word Counting =====")
+    log_file = "large_log_example.txt"
+    with open(log_file, "w", encoding="utf-8") as file:
+        for i in range(500000):
+            file.write(f"2024-01-{i % 28 + 1:02d} INFO  request {i}\tserved in {i % 97} ms\n")
+        file.write("last line without newline")
+
+    # Single process: decode the text and loop over its lines
+    start = time.perf_counter()
+    text_lines = text_words = 0
+    with open(log_file, "r", encoding="utf-8") as file:
+        for line in file:
+            text_lines += 1
+            text_words += len(line.split())
+    text_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    counts = count_file(log_file, chunk_size=4 * 1024 * 1024)
+    parallel_time = time.perf_counter() - start
+
+    print(f"Text loop:  {text_lines} lines, {text_words} words in {text_time:.3f}s")
+    print(f"count_file: {counts['lines']} lines, {counts['words']} words, "
+          f"{counts['bytes']} bytes in {parallel_time:.3f}s "
+          f"({os.cpu_count()} CPUs)")
+    print(f"Same result: {(text_lines, text_words) == (counts['lines'], counts['words'])}")
+    os.remove(log_file)